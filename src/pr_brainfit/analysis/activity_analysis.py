@@ -1,157 +1,156 @@
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
 from ..config.settings import ACTIVITY_THRESHOLDS
+from ..data.processor import sort_readings
+
+ACTIVITY_LEVELS = ['sedentary', 'light', 'moderate', 'intense']
+
+# Upper bound (as a fraction of heart rate reserve) of every level but 'intense'
+_ACTIVITY_CUTOFFS = np.array([
+    ACTIVITY_THRESHOLDS['sedentary'],
+    ACTIVITY_THRESHOLDS['light'],
+    ACTIVITY_THRESHOLDS['moderate']
+]) / 100
+
+def _baseline_frame(baselines):
+    """Convert the per-user baselines dict into a frame indexed by user_id."""
+    return pd.DataFrame.from_dict(
+        baselines, orient='index', columns=['resting_hr', 'hr_reserve']
+    ).rename_axis('user_id')
+
+def _assign_activity_codes(df, baseline_df):
+    """Classify each reading into an index of ACTIVITY_LEVELS (-1 if the user has no baseline)."""
+    # Line baselines up with the user_id categories, then gather them by category code
+    users = df['user_id'].cat.categories
+    user_codes = df['user_id'].cat.codes.to_numpy()
+    resting_hr = baseline_df['resting_hr'].reindex(users).to_numpy()
+    hr_reserve = baseline_df['hr_reserve'].reindex(users).to_numpy()
+    hr_reserve_used = (df['heart_rate'].to_numpy() - resting_hr[user_codes]) / hr_reserve[user_codes]
+    
+    # Each cutoff is inclusive, hence side='left'
+    codes = np.searchsorted(
+        _ACTIVITY_CUTOFFS, hr_reserve_used, side='left'
+    ).astype(np.int8)
+    codes[~users.isin(baseline_df.index)[user_codes]] = -1
+    
+    return codes
+
+def _map_groups(func, df, *args):
+    """Run func on each group's rows in a thread pool, keyed by group."""
+    groups = list(df.groupby('standardized_group', sort=False, observed=True))
+    
+    # Groups are independent and the heavy lifting is in numpy/pandas kernels
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(lambda item: func(item[1], *args), groups)
+        return {group: result for (group, _), result in zip(groups, results)}
+
+def _group_activity_distribution(group_data, baseline_df):
+    """Activity level distributions for one group's readings."""
+    total_records = len(group_data)
+    
+    # Calculate activity levels based on heart rate reserve
+    activity_codes = _assign_activity_codes(group_data, baseline_df)
+    has_baseline = activity_codes >= 0
+    activity_codes = activity_codes[has_baseline]
+    
+    # Convert overall distributions to percentages
+    counts = np.bincount(activity_codes, minlength=len(ACTIVITY_LEVELS))
+    activity_distribution = {
+        level: (count/total_records)*100 
+        for level, count in zip(ACTIVITY_LEVELS, counts)
+        if count > 0
+    }
+    
+    # Create hourly distribution DataFrame
+    hourly_distribution = pd.crosstab(
+        group_data['hour'][has_baseline],
+        activity_codes,
+        normalize='index'
+    ) * 100
+    hourly_distribution.columns = [
+        ACTIVITY_LEVELS[code] for code in hourly_distribution.columns
+    ]
+    
+    return {
+        'overall_distribution': activity_distribution,
+        'hourly_distribution': hourly_distribution,
+        'total_samples': total_records
+    }
 
 def analyze_activity_distribution(df, baselines):
     """Analyze activity level distributions for each group."""
-    activity_stats = {}
+    return _map_groups(_group_activity_distribution, df, _baseline_frame(baselines))
+
+def _group_transition_probabilities(group_data, baseline_df):
+    """Transition matrix and Markov properties for one group's readings."""
+    group_data = sort_readings(group_data, ['user_id', 'local_time'])
+    
+    # Calculate activity levels and the level each user moves to next
+    codes = _assign_activity_codes(group_data, baseline_df)
+    user_ids = group_data['user_id'].cat.codes.to_numpy()
+    from_codes, to_codes = codes[:-1], codes[1:]
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        # Calculate activity levels based on heart rate reserve
-        activity_levels = defaultdict(int)
-        hourly_activity = defaultdict(lambda: defaultdict(int))
-        total_records = len(group_data)
-        
-        for _, row in group_data.iterrows():
-            # Get baseline values for this user
-            user_baseline = baselines.get(row['user_id'])
-            if user_baseline:
-                resting_hr = user_baseline['resting_hr']
-                hr_reserve = user_baseline['hr_reserve']
-                
-                hr_reserve_used = (row['heart_rate'] - resting_hr) / hr_reserve
-                hour = row['local_time'].hour
-                
-                # Determine activity level
-                if hr_reserve_used <= ACTIVITY_THRESHOLDS['sedentary']/100:
-                    activity_level = 'sedentary'
-                elif hr_reserve_used <= ACTIVITY_THRESHOLDS['light']/100:
-                    activity_level = 'light'
-                elif hr_reserve_used <= ACTIVITY_THRESHOLDS['moderate']/100:
-                    activity_level = 'moderate'
-                else:
-                    activity_level = 'intense'
-                
-                activity_levels[activity_level] += 1
-                hourly_activity[hour][activity_level] += 1
-        
-        # Convert overall distributions to percentages
-        activity_distribution = {
-            level: (count/total_records)*100 
-            for level, count in activity_levels.items()
-        }
-        
-        # Create hourly distribution DataFrame
-        hourly_data = []
-        for hour in range(24):
-            hour_total = sum(hourly_activity[hour].values())
-            if hour_total > 0:
-                hour_dist = {
-                    level: (count/hour_total)*100 
-                    for level, count in hourly_activity[hour].items()
-                }
-                hour_dist['hour'] = hour
-                hourly_data.append(hour_dist)
-        
-        hourly_distribution = pd.DataFrame(hourly_data)
-        if not hourly_distribution.empty:
-            hourly_distribution.set_index('hour', inplace=True)
-        
-        activity_stats[group] = {
-            'overall_distribution': activity_distribution,
-            'hourly_distribution': hourly_distribution,
-            'total_samples': total_records
-        }
+    # Keep pairs within one user where both readings have a baseline
+    valid = (user_ids[:-1] == user_ids[1:]) & (from_codes >= 0) & (to_codes >= 0)
+    n_levels = len(ACTIVITY_LEVELS)
+    counts = np.bincount(
+        from_codes[valid].astype(np.intp) * n_levels + to_codes[valid],
+        minlength=n_levels * n_levels
+    ).reshape(n_levels, n_levels)
+    
+    # Create transition matrix over the levels actually observed
+    rows = np.flatnonzero(counts.sum(axis=1))
+    cols = np.flatnonzero(counts.sum(axis=0))
+    counts = counts[np.ix_(rows, cols)]
+    probs = counts / counts.sum(axis=1, keepdims=True)
+    transitions = pd.DataFrame(
+        probs,
+        index=pd.Index([ACTIVITY_LEVELS[code] for code in rows], name='activity_level'),
+        columns=pd.Index([ACTIVITY_LEVELS[code] for code in cols], name='next_activity')
+    )
     
-    return activity_stats
+    # Calculate steady state and duration only if we have transitions
+    if not transitions.empty:
+        steady_state = pd.Series(_steady_state_np(probs), index=transitions.columns)
+        avg_duration = pd.Series(_avg_duration_np(probs), index=transitions.columns)
+    else:
+        steady_state = pd.Series([], index=[])
+        avg_duration = pd.Series([], index=[])
+    
+    return {
+        'matrix': transitions,
+        'steady_state': steady_state,
+        'average_duration': avg_duration
+    }
 
 def calculate_transition_probabilities(df, baselines):
     """Calculate transition probabilities between activity levels."""
-    transition_matrices = {}
-    
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group].copy()
-        group_data = group_data.sort_values(['user_id', 'local_time'])
-        
-        # Calculate activity levels
-        activity_levels = []
-        for _, row in group_data.iterrows():
-            user_baseline = baselines.get(row['user_id'])
-            if user_baseline:
-                resting_hr = user_baseline['resting_hr']
-                hr_reserve = user_baseline['hr_reserve']
-                
-                hr_reserve_used = (row['heart_rate'] - resting_hr) / hr_reserve
-                
-                if hr_reserve_used <= ACTIVITY_THRESHOLDS['sedentary']/100:
-                    activity_levels.append('sedentary')
-                elif hr_reserve_used <= ACTIVITY_THRESHOLDS['light']/100:
-                    activity_levels.append('light')
-                elif hr_reserve_used <= ACTIVITY_THRESHOLDS['moderate']/100:
-                    activity_levels.append('moderate')
-                else:
-                    activity_levels.append('intense')
-            else:
-                activity_levels.append('unknown')
-        
-        group_data['activity_level'] = activity_levels
-        group_data['next_activity'] = group_data.groupby('user_id')['activity_level'].shift(-1)
-        
-        # Remove rows with unknown activity levels or transitions
-        group_data = group_data.dropna(subset=['activity_level', 'next_activity'])
-        group_data = group_data[group_data['activity_level'] != 'unknown']
-        group_data = group_data[group_data['next_activity'] != 'unknown']
-        
-        # Create transition matrix
-        transitions = pd.crosstab(
-            group_data['activity_level'],
-            group_data['next_activity'],
-            normalize='index'
-        )
-        
-        # Calculate Markov chain properties
-        markov_chain = nx.DiGraph(transitions.values)
-        
-        # Calculate steady state and duration only if we have transitions
-        if not transitions.empty:
-            steady_state = calculate_steady_state(transitions)
-            avg_duration = calculate_average_duration(transitions)
-        else:
-            steady_state = pd.Series([], index=[])
-            avg_duration = pd.Series([], index=[])
-        
-        transition_matrices[group] = {
-            'matrix': transitions,
-            'steady_state': steady_state,
-            'average_duration': avg_duration
-        }
-    
-    return transition_matrices
+    return _map_groups(_group_transition_probabilities, df, _baseline_frame(baselines))
+
+def _steady_state_np(P):
+    """Steady state distribution of a transition probability array."""
+    # Solve (P^T - I) v = 0 together with sum(v) = 1
+    n = P.shape[0]
+    a = np.vstack([P.T - np.eye(n), np.ones(n)])
+    b = np.concatenate([np.zeros(n), [1.0]])
+    steady_state, *_ = np.linalg.lstsq(a, b, rcond=None)
+    return steady_state
+
+def _avg_duration_np(P):
+    """Expected run length 1/(1-p) of each state, p being its stay probability."""
+    return 1.0 / (1.0 - np.diag(P))
 
 def calculate_steady_state(transition_matrix):
     """Calculate steady state probabilities for activity levels."""
-    eigenvals, eigenvects = np.linalg.eig(transition_matrix.T)
-    steady_state = eigenvects[:, np.argmax(eigenvals)].real
-    steady_state = steady_state / steady_state.sum()
-    
     return pd.Series(
-        steady_state, 
+        _steady_state_np(transition_matrix.to_numpy()), 
         index=transition_matrix.columns
     )
 
 def calculate_average_duration(transition_matrix):
     """Calculate average duration in each activity level."""
-    # Probability of staying in same state
-    stay_probs = np.diag(transition_matrix)
-    
-    # Average duration = 1/(1-p) where p is probability of staying
-    durations = 1/(1-stay_probs)
-    
     return pd.Series(
-        durations, 
+        _avg_duration_np(transition_matrix.to_numpy()), 
         index=transition_matrix.columns
-    )
\ No newline at end of file
+    )
@@ -2,53 +2,76 @@ import pandas as pd
 import numpy as np
 from scipy import signal
 import scipy
+from ..data.processor import sort_readings
+
+def _find_breaks(times, stress, smooth_stress, threshold_duration, stress_drop):
+    """Locate breaks in one user's time-ordered readings.
+    
+    Returns the start/end positions, durations (minutes) and mean stress of each break.
+    """
+    # Find significant drops (break starts) and rises (break ends)
+    stress_change = np.diff(smooth_stress, prepend=smooth_stress[0])
+    drops = np.flatnonzero(stress_change < -stress_drop)
+    rises = np.flatnonzero(stress_change > stress_drop)
+    
+    # Pair each drop with the next rise. Drops that share the same next rise
+    # fall inside one break, so only the first of each run opens a break;
+    # drops with no later rise never close.
+    next_rise = np.searchsorted(rises, drops, side='right')
+    closed = next_rise < len(rises)
+    drops, next_rise = drops[closed], next_rise[closed]
+    opens_break = np.r_[True, next_rise[1:] != next_rise[:-1]][:len(drops)]
+    starts = drops[opens_break]
+    ends = rises[next_rise[opens_break]]
+    
+    # Keep breaks that last long enough
+    durations = (times[ends] - times[starts]) / np.timedelta64(1, 'm')
+    long_enough = durations >= threshold_duration
+    starts, ends, durations = starts[long_enough], ends[long_enough], durations[long_enough]
+    
+    # Mean stress over each [start, end] window from one running sum
+    stress_csum = np.concatenate(([0.0], np.cumsum(stress, dtype=np.float64)))
+    reductions = (stress_csum[ends + 1] - stress_csum[starts]) / (ends - starts + 1)
+    
+    return starts, ends, durations, reductions
 
 def detect_breaks(df, threshold_duration=10, stress_drop=20):
     """Detect breaks based on sustained drops in stress score."""
-    breaks = {}
+    group_breaks = {group: [] for group in df['standardized_group'].unique()}
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        group_breaks = []
-        
-        for user_id in group_data['user_id'].unique():
-            user_data = group_data[group_data['user_id'] == user_id].copy()
-            user_data = user_data.sort_values('local_time')
-            
-            # Calculate rolling mean to smooth data
-            user_data['smooth_stress'] = user_data['stress_score'].rolling(
-                window=5, min_periods=1
-            ).mean()
-            
-            # Find significant drops
-            user_data['stress_drop'] = user_data['smooth_stress'].diff()
-            
-            # Identify break periods
-            in_break = False
-            break_start = None
-            
-            for idx, row in user_data.iterrows():
-                if not in_break and row['stress_drop'] < -stress_drop:
-                    break_start = row['local_time']
-                    in_break = True
-                elif in_break and row['stress_drop'] > stress_drop:
-                    break_duration = (row['local_time'] - break_start).total_seconds() / 60
-                    if break_duration >= threshold_duration:
-                        group_breaks.append({
-                            'user_id': user_id,
-                            'start_time': break_start,
-                            'end_time': row['local_time'],
-                            'duration': break_duration,
-                            'stress_reduction': user_data[
-                                (user_data['local_time'] >= break_start) &
-                                (user_data['local_time'] <= row['local_time'])
-                            ]['stress_score'].mean()
-                        })
-                    in_break = False
+    # Sort once so every (group, user) slice is contiguous and in time order
+    df = sort_readings(df, ['standardized_group', 'user_id', 'local_time'])
+    times = df['local_time'].values
+    stress = df['stress_score'].to_numpy()
+    
+    user_groups = df.groupby(['standardized_group', 'user_id'], sort=False, observed=True)
+    
+    # Calculate rolling mean to smooth data, for every user in one call
+    smooth_stress = user_groups['stress_score'].rolling(
+        window=5, min_periods=1
+    ).mean().to_numpy()
+    
+    for (group, user_id), rows in user_groups.indices.items():
+        user_slice = slice(rows[0], rows[-1] + 1)
+        starts, ends, durations, reductions = _find_breaks(
+            times[user_slice], stress[user_slice], smooth_stress[user_slice],
+            threshold_duration, stress_drop
+        )
+        if len(starts) == 0:
+            continue
         
-        breaks[group] = pd.DataFrame(group_breaks)
+        group_breaks[group].append(pd.DataFrame({
+            'user_id': user_id,
+            'start_time': df['local_time'].iloc[rows[0] + starts].to_numpy(),
+            'end_time': df['local_time'].iloc[rows[0] + ends].to_numpy(),
+            'duration': durations,
+            'stress_reduction': reductions
+        }))
     
-    return breaks
+    return {
+        group: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        for group, frames in group_breaks.items()
+    }
 
 def analyze_break_patterns(breaks_dict):
     """Analyze patterns in break timing and duration."""
@@ -75,34 +98,27 @@ def compare_group_breaks(breaks_dict):
     """Compare break patterns between groups."""
     comparisons = {}
     
-    # Extract key metrics for each group
-    metrics = {
-        group: {
-            'durations': breaks_df['duration'],
-            'times': breaks_df['start_time'].dt.hour,
-            'reductions': breaks_df['stress_reduction']
-        }
+    # Extract each group's break durations once for every pairing
+    durations = {
+        group: breaks_df['duration'].to_numpy()
         for group, breaks_df in breaks_dict.items()
         if len(breaks_df) > 0
     }
     
     # Perform statistical comparisons
-    groups = list(metrics.keys())
+    groups = list(durations.keys())
     for i in range(len(groups)):
         for j in range(i + 1, len(groups)):
             # Compare break durations
-            stat, p_val = scipy.stats.mannwhitneyu(
-                metrics[groups[i]]['durations'],
-                metrics[groups[j]]['durations']
-            )
+            stat, p_val = scipy.stats.mannwhitneyu(durations[groups[i]], durations[groups[j]])
             
             comparisons[f'{groups[i]}_vs_{groups[j]}'] = {
                 'duration_difference': stat,
                 'p_value': p_val,
                 'effect_size': stat / np.sqrt(
-                    len(metrics[groups[i]]['durations']) * 
-                    len(metrics[groups[j]]['durations'])
+                    len(durations[groups[i]]) * 
+                    len(durations[groups[j]])
                 )
             }
     
-    return comparisons
\ No newline at end of file
+    return comparisons
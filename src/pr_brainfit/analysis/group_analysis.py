@@ -4,56 +4,63 @@ from scipy import stats
 
 def calculate_consistency_scores(df):
     """Calculate consistency scores for each group."""
-    consistency_scores = {}
+    # Calculate day-to-day consistency
+    daily_stats = df.groupby(['standardized_group', 'date'], observed=True).agg(
+        stress_mean=('stress_score', 'mean'),
+        stress_std=('stress_score', 'std'),
+        hr_mean=('heart_rate', 'mean'),
+        hr_std=('heart_rate', 'std')
+    )
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        # Calculate day-to-day consistency
-        daily_stats = group_data.groupby('date').agg({
-            'stress_score': ['mean', 'std', 'count'],
-            'heart_rate': ['mean', 'std']
-        })
-        
-        # Calculate coefficient of variation
-        cv_stress = (daily_stats['stress_score']['std'] / daily_stats['stress_score']['mean']).mean()
-        cv_hr = (daily_stats['heart_rate']['std'] / daily_stats['heart_rate']['mean']).mean()
-        
-        # Calculate temporal consistency
-        temporal_consistency = group_data.groupby(
-            group_data['local_time'].dt.hour
-        )['stress_score'].std().mean()
-        
-        consistency_scores[group] = {
-            'cv_stress': cv_stress,
-            'cv_heart_rate': cv_hr,
-            'temporal_consistency': temporal_consistency,
-            'daily_variation': daily_stats['stress_score']['std'].mean()
+    # Calculate coefficient of variation
+    cv_stress = (daily_stats['stress_std'] / daily_stats['stress_mean']).groupby(level=0, observed=True).mean()
+    cv_hr = (daily_stats['hr_std'] / daily_stats['hr_mean']).groupby(level=0, observed=True).mean()
+    daily_variation = daily_stats['stress_std'].groupby(level=0, observed=True).mean()
+    
+    # Calculate temporal consistency
+    temporal_consistency = df.groupby(
+        ['standardized_group', 'hour'], observed=True
+    )['stress_score'].std().groupby(level=0, observed=True).mean()
+    
+    consistency_scores = {
+        group: {
+            'cv_stress': cv_stress[group],
+            'cv_heart_rate': cv_hr[group],
+            'temporal_consistency': temporal_consistency[group],
+            'daily_variation': daily_variation[group]
         }
+        for group in df['standardized_group'].unique()
+    }
     
     return consistency_scores
 
 def identify_outliers(df, method='iqr'):
     """Identify outliers in group data."""
-    outliers = {}
+    stress = df['stress_score']
+    group_stress = stress.groupby(df['standardized_group'], observed=True)
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        if method == 'iqr':
-            Q1 = group_data['stress_score'].quantile(0.25)
-            Q3 = group_data['stress_score'].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            outliers[group] = group_data[
-                (group_data['stress_score'] < (Q1 - 1.5 * IQR)) |
-                (group_data['stress_score'] > (Q3 + 1.5 * IQR))
-            ]
-        elif method == 'zscore':
-            z_scores = stats.zscore(group_data['stress_score'])
-            outliers[group] = group_data[abs(z_scores) > 3]
+    # Broadcast each group's limits back onto its rows
+    if method == 'iqr':
+        quartiles = group_stress.quantile([0.25, 0.75]).unstack()
+        Q1, Q3 = quartiles.reindex(df['standardized_group']).to_numpy().T
+        IQR = Q3 - Q1
+        is_outlier = (stress < (Q1 - 1.5 * IQR)) | (stress > (Q3 + 1.5 * IQR))
+    elif method == 'zscore':
+        z_scores = (stress - group_stress.transform('mean')) / group_stress.transform('std', ddof=0)
+        is_outlier = abs(z_scores) > 3
+    else:
+        return {}
+    
+    # Split the flagged rows back out by group
+    flagged = df[is_outlier]
+    flagged_groups = dict(list(
+        flagged.groupby('standardized_group', sort=False, observed=True)
+    ))
     
-    return outliers
+    return {
+        group: flagged_groups.get(group, flagged.iloc[:0])
+        for group in df['standardized_group'].unique()
+    }
 
 
 def compare_group_variability(df):
@@ -63,43 +70,39 @@ def compare_group_variability(df):
         
     comparisons = {}
     
-    # Calculate various variability metrics
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        if len(group_data) == 0:
-            continue
-            
-        # Intraday variability
-        intraday_var = group_data.groupby('date')['stress_score'].std().mean()
-        if pd.isna(intraday_var):
-            intraday_var = 0
-            
-        # Interday variability
-        daily_means = group_data.groupby('date')['stress_score'].mean()
-        interday_var = daily_means.std() if len(daily_means) > 1 else 0
-        
-        # User-to-user variability
-        user_means = group_data.groupby('user_id')['stress_score'].mean()
-        user_var = user_means.std() if len(user_means) > 1 else 0
-        
-        # Calculate stability score (avoid log(0))
-        stability = 1 / (1 + np.log1p(intraday_var + interday_var + 1e-10))
-        
+    # Intraday and interday variability from per-day stats
+    daily_stats = df.groupby(
+        ['standardized_group', 'date'], observed=True
+    )['stress_score'].agg(['mean', 'std'])
+    intraday_var = daily_stats['std'].groupby(level=0, observed=True).mean().fillna(0)
+    interday_var = daily_stats['mean'].groupby(level=0, observed=True).std().fillna(0)
+    
+    # User-to-user variability
+    user_var = df.groupby(
+        ['standardized_group', 'user_id'], observed=True
+    )['stress_score'].mean().groupby(level=0, observed=True).std().fillna(0)
+    
+    # Calculate stability score (avoid log(0))
+    stability = 1 / (1 + np.log1p(intraday_var + interday_var + 1e-10))
+    
+    group_stress = dict(list(
+        df.groupby('standardized_group', sort=False, observed=True)['stress_score']
+    ))
+    for group in group_stress:
         comparisons[group] = {
-            'intraday_variability': float(intraday_var),
-            'interday_variability': float(interday_var),
-            'user_variability': float(user_var),
-            'stability_score': float(stability)
+            'intraday_variability': float(intraday_var[group]),
+            'interday_variability': float(interday_var[group]),
+            'user_variability': float(user_var[group]),
+            'stability_score': float(stability[group])
         }
     
     # Perform statistical tests between groups only if we have at least 2 groups
-    groups = list(df['standardized_group'].unique())
+    groups = list(group_stress)
     if len(groups) >= 2:
         for i in range(len(groups)):
             for j in range(i + 1, len(groups)):
-                group1_data = df[df['standardized_group'] == groups[i]]['stress_score']
-                group2_data = df[df['standardized_group'] == groups[j]]['stress_score']
+                group1_data = group_stress[groups[i]]
+                group2_data = group_stress[groups[j]]
                 
                 if len(group1_data) > 0 and len(group2_data) > 0:
                     try:
@@ -1,8 +1,11 @@
 # PR_brainfit_analysis/analysis/metrics.py
 
 import pandas as pd
+import numpy as np
 import pytz
+from concurrent.futures import ThreadPoolExecutor
 from ..config.settings import *
+from .activity_analysis import ACTIVITY_LEVELS, _assign_activity_codes, _baseline_frame
 import scipy.stats as stats
 import plotly.graph_objects as go
 import matplotlib
@@ -11,7 +14,7 @@ from plotly.subplots import make_subplots
 
 def analyze_team_patterns(df, baselines):
     """Analyze patterns in the biometric data by team"""
-    df = df.copy()
+    df = df.copy(deep=False)
     
     # Create 15-minute interval timestamps with DST handling
     try:
@@ -20,79 +23,44 @@ def analyze_team_patterns(df, baselines):
         df['time_15'] = df['local_time'].dt.floor('15min', ambiguous='NaT')
         df = df.dropna(subset=['time_15'])
     
-    df['hour_minute'] = df['time_15'].dt.strftime('%H:%M')
-    df['date'] = df['local_time'].dt.date  # Add date
-    df['month'] = df['local_time'].dt.month  # Add month directly
+    df['minute_of_day'] = (df['time_15'].dt.hour * 60 + df['time_15'].dt.minute).astype(np.int16)
     
     # Create complete time range from 08:00 to 17:00 in 15-min intervals
-    all_times = pd.date_range(
-        start='2024-01-01 08:00:00',
-        end='2024-01-01 17:00:00',
-        freq='15min'
-    ).strftime('%H:%M').tolist()
-    
-    # Create patterns with date and month information
-    patterns = []
+    all_minutes = np.arange(8 * 60, 17 * 60 + 1, 15, dtype=np.int16)
+    time_labels = {minute: f'{minute // 60:02d}:{minute % 60:02d}' for minute in all_minutes}
+    
+    # Summarise every (group, time slot) in one pass over working-hours readings
+    working = df[df['is_working_hours']]
+    slot_stats = working.groupby(['standardized_group', 'minute_of_day'], observed=True).agg(
+        date=('date', 'first'),
+        month=('month', 'first'),
+        stress_mean=('stress_score', 'mean'),
+        stress_std=('stress_score', 'std')
+    )
     
-    for group in df['standardized_group'].unique():
-        group_data = df[
-            (df['standardized_group'] == group) & 
-            (df['is_working_hours'])
-        ]
-        
-        for time_slot in all_times:
-            time_data = group_data[group_data['hour_minute'] == time_slot]
-            
-            if len(time_data) > 0:
-                stress_mean = time_data['stress_score'].mean()
-                stress_std = time_data['stress_score'].std()
-                date = time_data['date'].iloc[0]  # Get date from the data
-                month = time_data['month'].iloc[0]  # Get month from the data
-            else:
-                stress_mean = None
-                stress_std = None
-                date = None
-                month = None
-            
-            activity_levels = {
-                'sedentary': 0,
-                'light': 0,
-                'moderate': 0,
-                'intense': 0
-            }
-            
-            if len(time_data) > 0:
-                for _, row in time_data.iterrows():
-                    hr_reserve_used = (row['heart_rate'] - baselines[row['user_id']]['resting_hr']) / \
-                                    baselines[row['user_id']]['hr_reserve']
-                    
-                    if hr_reserve_used <= ACTIVITY_THRESHOLDS['sedentary']/100:
-                        activity_levels['sedentary'] += 1
-                    elif hr_reserve_used <= ACTIVITY_THRESHOLDS['light']/100:
-                        activity_levels['light'] += 1
-                    elif hr_reserve_used <= ACTIVITY_THRESHOLDS['moderate']/100:
-                        activity_levels['moderate'] += 1
-                    else:
-                        activity_levels['intense'] += 1
-            
-            patterns.append({
-                'standardized_group': group,
-                'time': time_slot,
-                'date': date,
-                'month': month,
-                'stress_mean': stress_mean,
-                'stress_std': stress_std,
-                'activity_level': activity_levels
-            })
-    
-    patterns_df = pd.DataFrame(patterns)
+    # Classify every reading once and count activity levels per group/time slot
+    activity_counts = working.groupby(
+        [working['standardized_group'], working['minute_of_day'],
+         _assign_activity_codes(working, _baseline_frame(baselines))],
+        observed=True
+    ).size().unstack(fill_value=0).reindex(columns=range(len(ACTIVITY_LEVELS)), fill_value=0)
+    
+    # Lay the results out over every group and time slot, empty slots included
+    full_index = pd.MultiIndex.from_product(
+        [df['standardized_group'].unique(), all_minutes],  # Keeps the group column categorical
+        names=['standardized_group', 'time']
+    )
+    patterns_df = slot_stats.reindex(full_index).reset_index()
+    patterns_df['time'] = patterns_df['time'].map(time_labels)
+    patterns_df['activity_level'] = [
+        dict(zip(ACTIVITY_LEVELS, counts))
+        for counts in activity_counts.reindex(full_index, fill_value=0).to_numpy().tolist()
+    ]
     patterns_df = patterns_df.sort_values(['standardized_group', 'time'])
     
     # Interpolate missing values within each group
-    patterns_df['stress_mean'] = patterns_df.groupby('standardized_group')['stress_mean'].transform(
-        lambda x: x.interpolate(method='linear', limit_direction='both')
-    )
-    patterns_df['stress_std'] = patterns_df.groupby('standardized_group')['stress_std'].transform(
+    stress_columns = ['stress_mean', 'stress_std']
+    patterns_df[stress_columns] = patterns_df.groupby('standardized_group', observed=True)[stress_columns].transform(
         lambda x: x.interpolate(method='linear', limit_direction='both')
     )
     
@@ -128,18 +96,27 @@ def analyze_productivity_correlations(df):
         # Add p-values matrix
         p_values = correlations.copy()
         
-        # Calculate correlations and p-values
-        for phys_metric in physical_metrics:
-            for prod_metric in productivity_metrics:
-                if phys_metric in group_data.columns and prod_metric in group_data.columns:
-                    valid_data = group_data[[phys_metric, prod_metric]].dropna()
-                    if len(valid_data) > 1:  # Need at least 2 points for correlation
-                        correlation, p_value = stats.pearsonr(
-                            valid_data[phys_metric],
-                            valid_data[prod_metric]
-                        )
-                        correlations.loc[phys_metric, prod_metric] = correlation
-                        p_values.loc[phys_metric, prod_metric] = p_value
+        # Calculate all correlations at once over pairwise-complete observations
+        phys = [metric for metric in physical_metrics if metric in group_data.columns]
+        prod = [metric for metric in productivity_metrics if metric in group_data.columns]
+        if phys and prod:
+            values = group_data[phys + prod].astype(float)
+            observed = values.notna().astype(int)
+            n = observed.T.dot(observed).loc[phys, prod]
+            
+            # Clip rounding overshoot and make two-point fits exactly +/-1, as pearsonr does
+            r = values.corr().loc[phys, prod].clip(-1, 1)
+            r = r.mask(n == 2, np.sign(r))
+            
+            # Two-sided p-values from the t distribution, as scipy.stats.pearsonr
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_stat = r * np.sqrt((n - 2) / (1 - r ** 2))
+            p = pd.DataFrame(2 * stats.t.sf(np.abs(t_stat), n - 2), index=phys, columns=prod)
+            p = p.mask(n == 2, 1.0)
+            
+            # Need at least 2 points for correlation
+            correlations.loc[phys, prod] = r.where(n > 1)
+            p_values.loc[phys, prod] = p.where(n > 1)
         
         correlation_results['correlations'][group] = correlations
         correlation_results['statistics'][group] = p_values
@@ -158,13 +135,8 @@ def analyze_productivity_correlations(df):
 
 def create_monthly_biometric_summaries(df):
     """Create monthly summaries of biometric data for each group"""
-    # Add month and year columns for alignment with productivity data
-    df = df.copy()  # Create copy to avoid modifying original
-    df['month'] = df['local_time'].dt.month
-    df['year'] = df['local_time'].dt.year
-    
-    # Create monthly summaries
-    monthly_summaries = df.groupby(['year', 'month', 'standardized_group']).agg({
+    # Create monthly summaries (year and month align with the productivity data)
+    monthly_summaries = df.groupby(['year', 'month', 'standardized_group'], observed=True).agg({
         'stress_score': ['mean', 'std', 'median'],
         'heart_rate': ['mean', 'std'],
         'user_id': 'nunique'  # Track participation
@@ -180,44 +152,40 @@ def create_monthly_biometric_summaries(df):
 
 def analyze_productive_periods(biometric_df, cask_df, metric='receipts', threshold_percentile=75):
     """Identify high productivity periods and analyze corresponding biometric patterns"""
-    # Ensure we have year and month columns in biometric_df
-    biometric_df = biometric_df.copy()
-    biometric_df['year'] = biometric_df['local_time'].dt.year
-    biometric_df['month'] = biometric_df['local_time'].dt.month
+    biometric_df = biometric_df.copy(deep=False)  # Only the is_high_prod column is added
     
-    # Calculate productivity thresholds for each group
-    high_prod_thresholds = cask_df.groupby('site')[metric].quantile(threshold_percentile/100)
+    # Broadcast each site's productivity threshold back onto its months
+    high_prod_thresholds = cask_df.groupby('site')[metric].transform('quantile', threshold_percentile/100)
     
     # Identify high productivity months
     high_prod_months = cask_df[
-        cask_df.apply(lambda x: x[metric] >= high_prod_thresholds[x['site']], axis=1)
-    ][['year', 'month', 'site']].copy()
+        cask_df[metric] >= high_prod_thresholds
+    ][['year', 'month', 'site']]
     
-    # Tag biometric data for high productivity months
-    biometric_df['month_key'] = biometric_df.apply(
-        lambda x: f"{x['year']}_{x['month']}_{x['standardized_group']}", axis=1
-    )
-    high_prod_months['month_key'] = high_prod_months.apply(
-        lambda x: f"{x['year']}_{x['month']}_{x['site']}", axis=1
-    )
-    
-    biometric_df['is_high_prod'] = biometric_df['month_key'].isin(high_prod_months['month_key'])
+    # Tag biometric data for high productivity months by (year, month, group)
+    biometric_keys = pd.MultiIndex.from_arrays([
+        biometric_df['year'], biometric_df['month'], biometric_df['standardized_group']
+    ])
+    biometric_df['is_high_prod'] = biometric_keys.isin(pd.MultiIndex.from_frame(high_prod_months))
     
     return biometric_df
 
 def analyze_time_patterns(df, time_grouping='15min'):
     """Analyze time-of-day patterns, segmented by productivity levels"""
     # Create time block column
-    df = df.copy()
+    df = df.copy(deep=False)
     df['time_block'] = df['local_time'].dt.floor(time_grouping)
-    df['time_of_day'] = df['time_block'].dt.strftime('%H:%M')
+    
+    # Format each distinct block once rather than every reading (code -1, i.e. NaT, maps to NaN)
+    block_codes, blocks = pd.factorize(df['time_block'])
+    df['time_of_day'] = np.append(blocks.strftime('%H:%M'), np.nan)[block_codes]
     
     # Analyze patterns for high vs low productivity periods
     time_patterns = df.groupby([
         'standardized_group', 
         'time_of_day',
         'is_high_prod'
-    ]).agg({
+    ], observed=True).agg({
         'stress_score': ['mean', 'std', 'count'],
         'heart_rate': ['mean', 'std']
     }).reset_index()
@@ -233,17 +201,16 @@ def analyze_time_patterns(df, time_grouping='15min'):
     
     return time_patterns
 
-def calculate_effort_score(activity_dict):
-    """Calculate effort score considering all activity levels."""
-    total = sum(activity_dict.values())
-    if total == 0:
-        return 0
-        
+def _effort_scores(activity_counts):
+    """Effort score for each row of activity counts, columns ordered as ACTIVITY_LEVELS."""
+    activity_counts = np.asarray(activity_counts, dtype=float)
+    total = activity_counts.sum(axis=-1)
+    
     # Calculate percentages for each activity level
-    intense_pct = (activity_dict['intense'] / total) * 100
-    moderate_pct = (activity_dict['moderate'] / total) * 100
-    light_pct = (activity_dict['light'] / total) * 100
-    sedentary_pct = (activity_dict['sedentary'] / total) * 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sedentary_pct, light_pct, moderate_pct, intense_pct = np.moveaxis(
+            activity_counts / total[..., None] * 100, -1, 0
+        )
     
     # Calculate weighted score
     score = (intense_pct * 3 + moderate_pct * 2 + light_pct * 1 - sedentary_pct * 2)
@@ -253,31 +220,36 @@ def calculate_effort_score(activity_dict):
     # Minimum possible score would be -200 (100% sedentary)
     normalized_score = (score + 200) / 500 * 100
     
-    return max(0, min(100, normalized_score))  # Ensure between 0-100
+    # Ensure between 0-100, scoring 0 when there are no readings
+    return np.where(total > 0, np.clip(normalized_score, 0, 100), 0)
+
+def calculate_effort_score(activity_dict):
+    """Calculate effort score considering all activity levels."""
+    return float(_effort_scores([activity_dict[level] for level in ACTIVITY_LEVELS]))
 
 def create_effort_gap_visualization(patterns, cask_df):
     """Create effort gap visualization with both daily and monthly analysis."""
-    df = patterns.copy()
-    
-    # Calculate effort scores and sedentary percentages
-    effort_data = []
-    for _, row in df.iterrows():
-        time = row['time']
-        hour = pd.to_datetime(time, format='%H:%M').hour
-        total_time = sum(row['activity_level'].values())
-        sedentary_pct = (row['activity_level']['sedentary'] / total_time * 100) if total_time > 0 else 0
-        
-        effort_data.append({
-            'time': time,
-            'hour': hour,
-            'month': row['month'],
-            'standardized_group': row['standardized_group'],
-            'effort_score': calculate_effort_score(row['activity_level']),
-            'sedentary_pct': sedentary_pct,
-            'period': 'Morning' if hour < 13 else 'Afternoon'
-        })
-    
-    effort_df = pd.DataFrame(effort_data)
+    df = patterns  # Only read from, so no copy is needed
+    
+    # Unpack activity counts into an array and score every slot at once
+    activity_counts = np.array(
+        [[levels[level] for level in ACTIVITY_LEVELS] for levels in df['activity_level']],
+        dtype=float
+    ).reshape(-1, len(ACTIVITY_LEVELS))
+    total = activity_counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sedentary_pct = np.where(total > 0, activity_counts[:, 0] / total * 100, 0)
+    hour = pd.to_datetime(df['time'], format='%H:%M').dt.hour.to_numpy()
+    
+    effort_df = pd.DataFrame({
+        'time': df['time'].to_numpy(),
+        'hour': hour,
+        'month': df['month'].to_numpy(),
+        'standardized_group': df['standardized_group'].to_numpy(),
+        'effort_score': _effort_scores(activity_counts),
+        'sedentary_pct': sedentary_pct,
+        'period': np.where(hour < 13, 'Morning', 'Afternoon')
+    })
     
     # Calculate period averages for morning and afternoon
     for period in ['Morning', 'Afternoon']:
@@ -325,7 +297,7 @@ def create_effort_gap_visualization(patterns, cask_df):
         )
 
     # Prepare cask data
-    cask_monthly = cask_df.copy()
+    cask_monthly = cask_df.copy(deep=False)
     cask_monthly['period'] = pd.to_datetime(
         cask_monthly['year'].astype(str) + '-' + 
         cask_monthly['month'].astype(str) + '-01'
@@ -419,8 +391,8 @@ def combine_productivity_biometrics(monthly_biometrics, cask_df):
     print("\nCask df columns:", cask_df.columns.tolist())
     
     # Ensure consistent group names
-    monthly_biometrics = monthly_biometrics.copy()
-    cask_df = cask_df.copy()
+    monthly_biometrics = monthly_biometrics.copy(deep=False)
+    cask_df = cask_df.copy(deep=False)
     
     # Convert all group names to uppercase
     monthly_biometrics['standardized_group'] = monthly_biometrics['standardized_group'].str.upper()
@@ -476,11 +448,11 @@ def create_layered_analysis(biometric_df, cask_df):
     # 3. Identify high productivity periods
     biometric_df_tagged = analyze_productive_periods(biometric_df, cask_df)
     
-    # 4. Analyze time patterns
-    time_patterns = analyze_time_patterns(biometric_df_tagged)
-    
-    # 5. Calculate daily patterns
-    daily_patterns = analyze_time_patterns(biometric_df_tagged, 'D')
+    # 4-5. Analyze time patterns and daily patterns (independent, so run side by side)
+    with ThreadPoolExecutor() as executor:
+        time_future = executor.submit(analyze_time_patterns, biometric_df_tagged)
+        daily_future = executor.submit(analyze_time_patterns, biometric_df_tagged, 'D')
+        time_patterns, daily_patterns = time_future.result(), daily_future.result()
     
     return {
         'monthly_data': monthly_combined,
@@ -1,14 +1,38 @@
 import pandas as pd
 import numpy as np
-from scipy import signal
+from scipy import signal, fft
 from ..config.settings import *
+from .activity_analysis import _map_groups
+
+def _group_daily_patterns(group_data):
+    """Day-of-week statistics, peaks and weekly trends for one group's readings."""
+    # Calculate daily means and variance
+    daily_stats = group_data.groupby('day_of_week').agg({
+        'stress_score': ['mean', 'std', 'count'],
+        'heart_rate': ['mean', 'std']
+    })
+    
+    # Calculate rolling statistics
+    group_data['rolling_mean'] = group_data.groupby('user_id', sort=False, observed=True)['stress_score'].rolling(
+        window=12, min_periods=1  # 1-hour window (12 * 5min)
+    ).mean().reset_index(level=0, drop=True)
+    
+    # Find peaks in stress patterns
+    peaks, _ = signal.find_peaks(
+        group_data.groupby('day_of_week')['stress_score'].mean(),
+        distance=6  # Minimum 30 minutes between peaks
+    )
+    
+    return {
+        'daily_means': daily_stats['stress_score']['mean'],
+        'daily_variance': daily_stats['stress_score']['std'],
+        'peak_times': peaks,
+        # Calculate weekly trends
+        'weekly_trends': group_data.groupby(['week', 'day_of_week'])['stress_score'].mean().unstack()
+    }
 
 def analyze_daily_patterns(df):
     """Analyze patterns across days of the week."""
-    # Add day of week
-    df = df.copy() 
-    df['day_of_week'] = df['local_time'].dt.day_name()
-    
     patterns = {
         'daily_means': {},
         'daily_variance': {},
@@ -16,93 +40,91 @@ def analyze_daily_patterns(df):
         'weekly_trends': {}
     }
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group].copy()
-        
-        # Calculate daily means and variance
-        daily_stats = group_data.groupby('day_of_week').agg({
-            'stress_score': ['mean', 'std', 'count'],
-            'heart_rate': ['mean', 'std']
-        })
-        
-        patterns['daily_means'][group] = daily_stats['stress_score']['mean']
-        patterns['daily_variance'][group] = daily_stats['stress_score']['std']
-        
-        # Calculate rolling statistics
-        group_data['rolling_mean'] = group_data.groupby('user_id')['stress_score'].transform(
-            lambda x: x.rolling(window=12, min_periods=1).mean()  # 1-hour window (12 * 5min)
-        )
-        
-        # Find peaks in stress patterns
-        peaks, _ = signal.find_peaks(
-            group_data.groupby('day_of_week')['stress_score'].mean(),
-            distance=6  # Minimum 30 minutes between peaks
-        )
-        
-        patterns['peak_times'][group] = peaks
-        
-        # Calculate weekly trends
-        patterns['weekly_trends'][group] = group_data.groupby(
-            [group_data['local_time'].dt.isocalendar().week, 'day_of_week']
-        )['stress_score'].mean().unstack()
+    for group, group_patterns in _map_groups(_group_daily_patterns, df).items():
+        for key, value in group_patterns.items():
+            patterns[key][group] = value
     
     return patterns
 
+def _group_variance(group_data):
+    """Variance scores for one group's readings."""
+    # Calculate within-day variance
+    within_day = group_data.groupby(['date', 'user_id'], observed=True)['stress_score'].std().mean()
+    
+    # Calculate between-day variance
+    between_day = group_data.groupby('date')['stress_score'].mean().std()
+    
+    # Calculate user-to-user variance
+    user_variance = group_data.groupby('user_id', observed=True)['stress_score'].mean().std()
+    
+    return {
+        'within_day_variance': within_day,
+        'between_day_variance': between_day,
+        'user_variance': user_variance,
+        'total_variance': group_data['stress_score'].std()
+    }
+
 def calculate_group_variance(df):
     """Calculate variance scores within groups."""
-    variance_scores = {}
+    return _map_groups(_group_variance, df)
+
+def _lagged_autocorrelations(values, max_lag):
+    """Series.autocorr for every lag from 1 to max_lag, from a single FFT."""
+    y = np.asarray(values, dtype=float)
+    y = y - y.mean()
+    n = len(y)
+    lags = np.arange(1, max_lag + 1)
+    
+    # sum(y[i] * y[i + lag]) for every lag; zero-padding stops wrap-around
+    n_fft = fft.next_fast_len(n + max_lag)
+    spectrum = np.fft.rfft(y, n_fft)
+    lagged_products = np.fft.irfft(spectrum * np.conj(spectrum), n_fft)[lags]
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        # Calculate within-day variance
-        within_day = group_data.groupby(['date', 'user_id'])['stress_score'].std().mean()
-        
-        # Calculate between-day variance
-        between_day = group_data.groupby('date')['stress_score'].mean().std()
-        
-        # Calculate user-to-user variance
-        user_variance = group_data.groupby('user_id')['stress_score'].mean().std()
-        
-        variance_scores[group] = {
-            'within_day_variance': within_day,
-            'between_day_variance': between_day,
-            'user_variance': user_variance,
-            'total_variance': group_data['stress_score'].std()
-        }
+    # Sums and sums of squares of the leading y[:-lag] and trailing y[lag:] windows
+    overlap = np.maximum(n - lags, 0)
+    csum = np.concatenate(([0.0], np.cumsum(y)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(y * y)))
+    lead_sum, lead_sq = csum[overlap], csum_sq[overlap]
+    trail_sum = csum[n] - csum[np.minimum(lags, n)]
+    trail_sq = csum_sq[n] - csum_sq[np.minimum(lags, n)]
     
-    return variance_scores
+    # Pearson correlation of each pair of windows, each about its own mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = lagged_products - lead_sum * trail_sum / overlap
+        lead_var = lead_sq - lead_sum ** 2 / overlap
+        trail_var = trail_sq - trail_sum ** 2 / overlap
+        autocorr = covariance / np.sqrt(lead_var * trail_var)
+    autocorr[overlap < 2] = np.nan
+    
+    return autocorr
 
-def find_recurring_patterns(df, window_size=12):  # 1-hour window
-    """Identify recurring patterns in stress scores."""
-    patterns = {}
+def _group_recurring_patterns(group_data, window_size):
+    """Autocorrelation peaks and common rolling levels for one group's readings."""
+    # Calculate autocorrelation
+    autocorr = pd.Series(
+        _lagged_autocorrelations(group_data['stress_score'], max_lag=48)  # 4-hour span
+    )
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        
-        # Calculate autocorrelation
-        autocorr = pd.Series(
-            [group_data['stress_score'].autocorr(lag=i) for i in range(1, 49)]  # 4-hour span
-        )
-        
-        # Find peaks in autocorrelation
-        peaks, properties = signal.find_peaks(
-            autocorr,
-            height=0.3,  # Minimum correlation
-            distance=6   # Minimum 30 minutes between peaks
-        )
-        
-        # Identify common patterns
-        rolling_patterns = group_data['stress_score'].rolling(window=window_size).mean()
-        pattern_times = rolling_patterns.groupby(
-            rolling_patterns.round(1)
-        ).size().sort_values(ascending=False)
-        
-        patterns[group] = {
-            'autocorrelation_peaks': peaks,
-            'peak_heights': properties['peak_heights'],
-            'common_patterns': pattern_times.head(5),
-            'pattern_frequency': len(peaks)
-        }
+    # Find peaks in autocorrelation
+    peaks, properties = signal.find_peaks(
+        autocorr,
+        height=0.3,  # Minimum correlation
+        distance=6   # Minimum 30 minutes between peaks
+    )
     
-    return patterns
\ No newline at end of file
+    # Identify common patterns
+    rolling_patterns = group_data['stress_score'].rolling(window=window_size).mean()
+    pattern_times = rolling_patterns.groupby(
+        rolling_patterns.round(1)
+    ).size().sort_values(ascending=False)
+    
+    return {
+        'autocorrelation_peaks': peaks,
+        'peak_heights': properties['peak_heights'],
+        'common_patterns': pattern_times.head(5),
+        'pattern_frequency': len(peaks)
+    }
+
+def find_recurring_patterns(df, window_size=12):  # 1-hour window
+    """Identify recurring patterns in stress scores."""
+    return _map_groups(_group_recurring_patterns, df, window_size)
\ No newline at end of file
@@ -2,47 +2,71 @@ import pandas as pd
 import numpy as np
 from scipy import signal
 from datetime import timedelta
+from .activity_analysis import _map_groups
 
-def detect_peaks(df, prominence=20, width=5):
-    """Detect stress score peaks and analyze their characteristics."""
-    peaks_data = {}
+def _first_at_or_below(values, starts, limits):
+    """Index of the first value at or below each limit from each start on (len(values) if none)."""
+    # range_min[k][i] is the minimum of values[i:i + 2**k]
+    range_min = [values]
+    while 2 ** len(range_min) <= len(values):
+        step = 2 ** (len(range_min) - 1)
+        range_min.append(np.minimum(range_min[-1][:-step], range_min[-1][step:]))
     
-    for group in df['standardized_group'].unique():
-        group_data = df[df['standardized_group'] == group]
-        group_peaks = []
+    # Skip every block that stays above the limit, largest blocks first
+    positions = np.array(starts)
+    for k in range(len(range_min) - 1, -1, -1):
+        level = range_min[k]
+        in_range = positions < len(level)
+        above = np.zeros(len(positions), dtype=bool)
+        above[in_range] = level[positions[in_range]] > limits[in_range]
+        positions[above] += 2 ** k
+    
+    return positions
+
+def _group_peaks(group_data, prominence, width):
+    """Peaks and recovery times for every user in one group's readings."""
+    group_peaks = []
+    
+    for user_id, user_data in group_data.groupby('user_id', sort=False, observed=True):
+        user_data = user_data.sort_values('local_time')
+        stress = user_data['stress_score'].to_numpy()
         
-        for user_id in group_data['user_id'].unique():
-            user_data = group_data[group_data['user_id'] == user_id].copy()
-            user_data = user_data.sort_values('local_time')
-            
-            # Find peaks
-            peaks, properties = signal.find_peaks(
-                user_data['stress_score'],
-                prominence=prominence,
-                width=width
-            )
-            
-            for idx, peak in enumerate(peaks):
-                peak_time = user_data.iloc[peak]['local_time']
-                
-                # Calculate recovery time
-                recovery_end = find_recovery_end(
-                    user_data.iloc[peak:],
-                    user_data.iloc[peak]['stress_score']
-                )
-                
-                group_peaks.append({
-                    'user_id': user_id,
-                    'peak_time': peak_time,
-                    'peak_value': user_data.iloc[peak]['stress_score'],
-                    'prominence': properties['prominences'][idx],
-                    'width': properties['widths'][idx],
-                    'recovery_time': recovery_end - peak_time if recovery_end else None
-                })
+        # Find peaks
+        peaks, properties = signal.find_peaks(
+            stress,
+            prominence=prominence,
+            width=width
+        )
+        if len(peaks) == 0:
+            continue
+        
+        # Recovery threshold from the mean stress between each peak and the end of the series
+        tail_means = np.cumsum(stress[::-1])[::-1] / np.arange(len(stress), 0, -1)
+        thresholds = tail_means[peaks] + (stress[peaks] - tail_means[peaks]) * 0.2  # 80% recovery
+        
+        # First reading at or after each peak that falls back to its threshold
+        recovery_idx = _first_at_or_below(stress, peaks, thresholds)
+        recovered = recovery_idx < len(stress)
+        recovery_idx = np.where(recovered, recovery_idx, peaks)
+        
+        times = user_data['local_time'].reset_index(drop=True)
+        peak_times = times.iloc[peaks].reset_index(drop=True)
+        recovery_times = times.iloc[recovery_idx].reset_index(drop=True) - peak_times
         
-        peaks_data[group] = pd.DataFrame(group_peaks)
+        group_peaks.append(pd.DataFrame({
+            'user_id': user_id,
+            'peak_time': peak_times,
+            'peak_value': stress[peaks],
+            'prominence': properties['prominences'],
+            'width': properties['widths'],
+            'recovery_time': recovery_times.where(recovered)
+        }))
     
-    return peaks_data
+    return pd.concat(group_peaks, ignore_index=True) if group_peaks else pd.DataFrame()
+
+def detect_peaks(df, prominence=20, width=5):
+    """Detect stress score peaks and analyze their characteristics."""
+    return _map_groups(_group_peaks, df, prominence, width)
 
 def find_recovery_end(data, peak_value):
     """Find when stress returns to normal after a peak."""
@@ -1,105 +1,148 @@
 import pandas as pd
 import numpy as np
+from collections import defaultdict
 from scipy import stats
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+# 'HH:MM' label for every minute of the day
+_MINUTE_LABELS = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60)], dtype=object)
+
+def _kruskal_blocks(blocks):
+    """Kruskal-Wallis H statistics and p-values for many blocks of samples at once.
+    
+    Mirrors scipy.stats.kruskal, ranking every block in one sort. Each block is
+    a list of the same number of samples.
+    """
+    if len(blocks) == 0:
+        return np.array([]), np.array([])
+    n_groups = len(blocks[0])
+    sizes = np.array([[len(sample) for sample in block] for block in blocks])
+    totals = sizes.sum(axis=1)
+    
+    # Pool every block's samples and sort by (block, value)
+    values = np.concatenate([sample for block in blocks for sample in block])
+    sample_ids = np.repeat(np.arange(sizes.size), sizes.ravel())
+    block_ids = sample_ids // n_groups
+    order = np.lexsort((values, block_ids))
+    values, sample_ids, block_ids = values[order], sample_ids[order], block_ids[order]
+    
+    # Average ranks within each run of tied values, ranks restarting at 1 for every block
+    block_starts = np.concatenate(([0], np.cumsum(totals)[:-1]))
+    ranks = np.arange(len(values)) - block_starts[block_ids] + 1
+    run_start = np.ones(len(values), dtype=bool)
+    run_start[1:] = (block_ids[1:] != block_ids[:-1]) | (values[1:] != values[:-1])
+    run_ids = np.cumsum(run_start) - 1
+    run_sizes = np.bincount(run_ids)
+    ranks = (ranks[run_start] + (run_sizes - 1) / 2)[run_ids]
+    
+    # Tie correction and the sum of squared rank sums over sample sizes, per block
+    ties = 1 - np.bincount(
+        block_ids[run_start], weights=run_sizes**3 - run_sizes, minlength=len(blocks)
+    ) / (totals**3 - totals)
+    rank_sums = np.bincount(sample_ids, weights=ranks, minlength=sizes.size).reshape(sizes.shape)
+    ssbn = (rank_sums**2 / sizes).sum(axis=1)
+    
+    h = 12.0 / (totals * (totals + 1)) * ssbn - 3 * (totals + 1)
+    h /= ties
+    
+    return h, stats.chi2.sf(h, n_groups - 1)
+
 def run_time_comparisons(df):
     """
     Run statistical comparisons between groups for each 15-min time block,
     aggregating across days.
     """
-    # Ensure local_time is datetime and create time_block
-    df['time_block'] = df['local_time'].dt.strftime('%H:%M')
+    # Key readings by minute of the day, labelling time_block from a lookup
+    minute_of_day = (df['local_time'].dt.hour * 60 + df['local_time'].dt.minute).to_numpy().astype(np.int16)
+    df['time_block'] = _MINUTE_LABELS[minute_of_day]
     
     # Add date column for aggregation
     df['date'] = df['local_time'].dt.date
+    local_day = df['local_time'].dt.tz_localize(None).to_numpy().astype('datetime64[D]').astype(np.int64)
+    
+    # Groups in order of appearance, one results column each
+    groups = df['standardized_group'].unique()
+    
+    min_samples = 5  # Minimum samples needed per group
+    
+    # Number each (minute, group) cell
+    stress = df['stress_score'].to_numpy()
+    cells = minute_of_day.astype(np.int64) * len(groups) + pd.factorize(df['standardized_group'])[0]
+    
+    # Distinct days in every cell, counting the unique (cell, day) pairs of each cell
+    day_index = local_day - (local_day.min() if len(local_day) else 0)
+    n_days = day_index.max() + 1 if len(day_index) else 1
+    cell_day_pairs = np.unique(cells * n_days + day_index)
+    cell_days = np.bincount(
+        cell_day_pairs // n_days, minlength=len(_MINUTE_LABELS) * len(groups)
+    ).reshape(len(_MINUTE_LABELS), len(groups))
+    
+    # Only blocks where every group has enough days are tested, so drop other readings up front
+    sufficient_minutes = (cell_days >= min_samples).all(axis=1)
+    tested = sufficient_minutes[minute_of_day]
+    stress, cells = stress[tested], cells[tested]
+    
+    # Sort the remaining readings into cells, by value within each cell, so every cell is a
+    # contiguous, ordered slice serving both its values and its median
+    order = np.lexsort((stress, cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.diff(sorted_cells, prepend=-1) != 0)
+    sizes = np.diff(np.append(starts, len(cells)))
+    by_value = stress[order]
+    medians = (by_value[starts + (sizes - 1) // 2] + by_value[starts + sizes // 2]) / 2
+    
+    # One row per time block present in the data, one column per group; blocks skipped for
+    # insufficient data keep NaN statistics and medians
+    minutes = np.unique(minute_of_day)
+    cell_medians = np.full(len(_MINUTE_LABELS) * len(groups), np.nan)
+    cell_medians[sorted_cells[starts]] = medians
+    block_medians = cell_medians.reshape(len(_MINUTE_LABELS), len(groups))[minutes]
+    block_days = cell_days[minutes]
     
-    # Initialize results storage
     results = {
-        'time_blocks': [],
-        'h_statistic': [],
-        'p_value': [],
-        'effect_size': [],
-        'group_medians': {},
+        'time_blocks': _MINUTE_LABELS[minutes],
+        'h_statistic': np.full(len(minutes), np.nan),
+        'p_value': np.full(len(minutes), np.nan),
+        'effect_size': np.full(len(minutes), np.nan),
+        'group_medians': {group: block_medians[:, g] for g, group in enumerate(groups)},
         'significant_differences': [],
-        'sample_sizes': {}  # Add sample size tracking
+        'sample_sizes': {group: block_days[:, g] for g, group in enumerate(groups)}  # Unique days per block
     }
     
-    # Initialize storage for each group
-    groups = df['standardized_group'].unique()
-    for group in groups:
-        results['group_medians'][group] = []
-        results['sample_sizes'][group] = []
+    # Every tested block has all its group cells, consecutive in sorted order
+    tested_positions = np.flatnonzero(sufficient_minutes[minutes])
+    samples = np.split(by_value, starts[1:]) if len(by_value) else []
+    tested_blocks = [samples[b * len(groups):(b + 1) * len(groups)] for b in range(len(tested_positions))]
     
-    min_samples = 5  # Minimum samples needed per group
+    # Run every block's Kruskal-Wallis test in one batch, with effect sizes (epsilon-squared)
+    h_stats, p_vals = _kruskal_blocks(tested_blocks)
+    n = sizes.reshape(len(tested_positions), len(groups)).sum(axis=1)
+    results['h_statistic'][tested_positions] = h_stats
+    results['p_value'][tested_positions] = p_vals
+    results['effect_size'][tested_positions] = (h_stats - len(groups) + 1) / (n - len(groups))
     
-    # Analyze each 15-min block
-    for time_block in sorted(df['time_block'].unique()):
-        block_data = df[df['time_block'] == time_block]
-        
-        # Get data for each group, aggregating across days
-        groups_data = []
-        sufficient_data = True
-        
-        for group in groups:
-            group_data = block_data[block_data['standardized_group'] == group]
-            # Count unique days with data for this time block
-            sample_size = len(group_data['date'].unique())
-            results['sample_sizes'][group].append(sample_size)
-            
-            if sample_size < min_samples:
-                sufficient_data = False
-            
-            groups_data.append(group_data['stress_score'].values)
-        
-        # Skip this time block if insufficient data
-        if not sufficient_data:
-            # Add NaN values to maintain array lengths
-            results['time_blocks'].append(time_block)
-            results['h_statistic'].append(np.nan)
-            results['p_value'].append(np.nan)
-            results['effect_size'].append(np.nan)
-            for group in groups:
-                results['group_medians'][group].append(np.nan)
-            continue
-        
-        # Run Kruskal-Wallis test
-        h_stat, p_val = stats.kruskal(*groups_data)
-        
-        # Calculate effect size (epsilon-squared)
-        n = sum(len(gd) for gd in groups_data)
-        effect_size = (h_stat - len(groups_data) + 1) / (n - len(groups_data))
-        
-        # Store results
-        results['time_blocks'].append(time_block)
-        results['h_statistic'].append(h_stat)
-        results['p_value'].append(p_val)
-        results['effect_size'].append(effect_size)
-        
-        # Store group medians
-        for group in groups:
-            group_data = block_data[block_data['standardized_group'] == group]
-            results['group_medians'][group].append(group_data['stress_score'].median())
-        
-        # If significant difference found, run post-hoc tests
+    # Group pairs to compare post hoc in blocks with a significant difference
+    posthoc_pairs = []
+    
+    for position, groups_data, p_val in zip(tested_positions, tested_blocks, p_vals):
         if p_val < 0.05:
+            time_block = results['time_blocks'][position]
             for i in range(len(groups)):
                 for j in range(i + 1, len(groups)):
-                    group1_data = block_data[block_data['standardized_group'] == groups[i]]['stress_score']
-                    group2_data = block_data[block_data['standardized_group'] == groups[j]]['stress_score']
-                    
-                    if len(group1_data) >= min_samples and len(group2_data) >= min_samples:
-                        stat, p = stats.mannwhitneyu(group1_data, group2_data, alternative='two-sided')
-                        
-                        # Apply Bonferroni correction
-                        if p < (0.05 / (len(groups) * (len(groups) - 1) / 2)):
-                            results['significant_differences'].append({
-                                'time_block': time_block,
-                                'group1': groups[i],
-                                'group2': groups[j],
-                                'p_value': p
-                            })
+                    if len(groups_data[i]) >= min_samples and len(groups_data[j]) >= min_samples:
+                        posthoc_pairs.append((time_block, i, j, groups_data[i], groups_data[j]))
+    
+    # Run every post-hoc test, applying Bonferroni correction
+    for time_block, i, j, data1, data2 in posthoc_pairs:
+        p = stats.mannwhitneyu(data1, data2, alternative='two-sided').pvalue
+        if p < (0.05 / (len(groups) * (len(groups) - 1) / 2)):
+            results['significant_differences'].append({
+                'time_block': time_block,
+                'group1': groups[i],
+                'group2': groups[j],
+                'p_value': p
+            })
     
     return results
 
@@ -113,23 +156,33 @@ def analyze_group_differences(df):
     groups = ['DALMUIR', 'KILMALID', 'KB3']
     significant_differences = {group: {} for group in groups}
     
+    # Partition stress scores by time block, then group, in one pass
+    stress = df['stress_score'].to_numpy()
+    block_groups = df.groupby(['time_block', 'standardized_group'], observed=True)
+    block_stress = defaultdict(dict)
+    for (time_block, group), rows in block_groups.indices.items():
+        block_stress[time_block][group] = stress[rows]
+    empty = stress[:0]
+    
     # For each time block, check if each group is different from others
-    for time_block in sorted(df['time_block'].unique()):
-        block_data = df[df['time_block'] == time_block]
+    for time_block in sorted(block_stress):
+        cells = block_stress[time_block]
         
         for group in groups:
-            group_data = block_data[block_data['standardized_group'] == group]['stress_score']
-            other_data = block_data[block_data['standardized_group'] != group]['stress_score']
+            group_data = cells.get(group, empty)
+            other_data = np.concatenate([empty] + [data for other, data in cells.items() if other != group])
             
             if len(group_data) >= 5 and len(other_data) >= 5:
                 stat, p = stats.mannwhitneyu(group_data, other_data, alternative='two-sided')
                 
                 if p < 0.05:  # Store only significant differences
+                    # Each median is a single quickselect (np.partition) pass
+                    group_median, others_median = np.median(group_data), np.median(other_data)
                     significant_differences[group][time_block] = {
                         'p_value': p,
-                        'group_median': group_data.median(),
-                        'others_median': other_data.median(),
-                        'difference': group_data.median() - other_data.median()
+                        'group_median': group_median,
+                        'others_median': others_median,
+                        'difference': group_median - others_median
                     }
     
     return significant_differences
@@ -153,13 +206,15 @@ def plot_group_differences(differences):
         'KB3': '#2ca02c'
     }
     
+    # Build one bar trace per group with significant differences, then add them together
+    traces, rows = [], []
     for idx, (group, data) in enumerate(differences.items(), 1):
         if data:  # Only plot if there are significant differences
             times = list(data.keys())
             diffs = [data[t]['difference'] for t in times]
             p_values = [data[t]['p_value'] for t in times]
             
-            fig.add_trace(
+            traces.append(
                 go.Bar(
                     x=times,
                     y=diffs,
@@ -172,9 +227,11 @@ def plot_group_differences(differences):
                         "p-value: %{customdata:.3f}<br>" +
                         "<extra></extra>"
                     )
-                ),
-                row=idx, col=1
+                )
             )
+            rows.append(idx)
+    
+    fig.add_traces(traces, rows=rows, cols=[1] * len(traces))
     
     # Update layout
     fig.update_layout(
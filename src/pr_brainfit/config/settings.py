@@ -32,6 +32,9 @@ except ImportError:
     BIOMETRIC_DATA_PATH = DATA_DIR / 'historic_processed_data_for_plotting.json'
     CASK_DATA_PATH = DATA_DIR / 'cask_data.csv'
     
+# Directory for caching the parsed biometric export between runs (off unless set)
+BIOMETRIC_CACHE_DIR = os.getenv('BIOMETRIC_CACHE_DIR')
+
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
 
 # Time settings
@@ -1,6 +1,10 @@
 # PR_brainfit_analysis/data/loaders.py
 
+import hashlib
 import json
+import os
+from pathlib import Path
+import numpy as np
 import pandas as pd
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -8,26 +12,60 @@ from datetime import datetime
 import pytz
 from pr_brainfit.config.settings import * 
 
-def load_biometric_data(file_path):
-    """Load and process biometric data from JSON"""
+# Bump whenever the parsed frame changes so older cache entries are rebuilt
+_BIOMETRIC_CACHE_VERSION = 1
+
+def _biometric_cache_key(file_path):
+    """Cache key for a biometric export, from the cache version and the file's size, mtime and leading bytes"""
+    stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        head = f.read(1 << 20)
+    return hashlib.blake2b(
+        head + f'{_BIOMETRIC_CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}'.encode(), digest_size=12
+    ).hexdigest()
+
+def _biometric_cache_path(file_path, cache_dir):
+    """Cache file for a biometric export, one per source path"""
+    path_key = hashlib.blake2b(str(Path(file_path).resolve()).encode(), digest_size=12).hexdigest()
+    return Path(cache_dir) / f'biometric_{path_key}.pkl'
+
+def load_biometric_data(file_path, cache_dir=None):
+    """Load and process biometric data from JSON, reusing a parsed frame from cache_dir if given and the file is unchanged"""
+    if cache_dir is not None:
+        cache_key = _biometric_cache_key(file_path)
+        cache_path = _biometric_cache_path(file_path, cache_dir)
+        if cache_path.exists():
+            cached_key, cached_df = pd.read_pickle(cache_path)
+            if cached_key == cache_key:
+                return cached_df
+    
     with open(file_path, 'r') as f:
         data = json.load(f)
     
-    # Initialize lists for raw data
+    # Collect each user's records as-is and how many belong to them
     raw_records = []
+    record_counts = []
     
-    for user_id, user_data in data.items():
+    for user_data in data.values():
         raw_data = user_data.get('historic_raw_data', [])
-        for record in raw_data:
-            record['user_id'] = user_id
-            raw_records.append(record)
+        raw_records.extend(raw_data)
+        record_counts.append(len(raw_data))
     
-    # Convert to DataFrame
+    # Convert to DataFrame, filling user_id per user rather than per record
     df = pd.DataFrame(raw_records)
+    df['user_id'] = np.repeat(list(data.keys()), record_counts)
     
     # Use ISO8601 format to handle timestamps with microseconds
     df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
     
+    # Heart rates are small whole numbers, so store them as int16
+    df['heart_rate'] = df['heart_rate'].astype(np.int16)
+    
+    # Overwrite this file's cache entry, storing the key it was parsed under
+    if cache_dir is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle((cache_key, df), cache_path)
+    
     return df
 
 
@@ -49,8 +87,8 @@ def load_user_data():
     headers = [col.strip().lower() for col in values[0]]
     df = pd.DataFrame(values[1:], columns=headers)
     
-    # Convert age to numeric
-    df['age'] = pd.to_numeric(df['age'], errors='coerce')
+    # Convert age to numeric (whole years are exact in float32, which halves the merged column)
+    df['age'] = pd.to_numeric(df['age'], errors='coerce').astype(np.float32)
     
     # Filter for PR org and specific groups
     valid_groups = ['kilmalid', 'dalmuir', 'kb3', 'nops']
@@ -64,6 +102,9 @@ def load_user_data():
 def load_cask_data(file_path):
     df = pd.read_csv(file_path)
     
+    # Monthly counts fit comfortably in int32
+    df[['receipts', 'dispatches']] = df[['receipts', 'dispatches']].astype(np.int32)
+    
     # Create date column from year and month
     df['date'] = pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str) + '-01')
     
@@ -5,107 +5,141 @@ import numpy as np
 from datetime import datetime, time
 from ..config.settings import *
 
+# Upper-cased group name variants mapped onto our three standardized groups
+_GROUP_VARIANTS = {
+    'KILMALID': 'KILMALID',
+    'DALMUIR': 'DALMUIR',
+    'KB3': 'KB3',
+    'NOPS': 'KB3'
+}
+
+# Day names indexed by days since 1970-01-01 (a Thursday) modulo 7, Monday first
+_DAY_NAMES = np.array(
+    ['Thursday', 'Friday', 'Saturday', 'Sunday', 'Monday', 'Tuesday', 'Wednesday'], dtype=object
+)
+
+_IS_WEEKDAY = np.isin(_DAY_NAMES, ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])
+
+_NS_PER_SECOND = 10**9
+_NS_PER_DAY = 86400 * _NS_PER_SECOND
+
+
+def _seconds_since_midnight(t):
+    """Clock time in seconds for a datetime.time"""
+    return (t.hour * 60 + t.minute) * 60 + t.second + t.microsecond / 1e6
+
+def _stress_scores(heart_rate, age):
+    """Stress score (0-100) for each reading, updating two buffers in place rather than chaining temporaries"""
+    # Usable heart rate range per reading (max HR of 220 - age, 180 if age unknown)
+    hr_range = np.subtract(220, age)
+    hr_range[np.isnan(hr_range)] = 180
+    hr_range -= QUALITY_THRESHOLDS['min_hr']
+    
+    stress_score = heart_rate.astype(np.float64)
+    stress_score -= QUALITY_THRESHOLDS['min_hr']
+    stress_score /= hr_range
+    stress_score *= 100
+    return np.clip(stress_score, 0, 100, out=stress_score)  # Ensure within 0-100 range
 
 def clean_biometric_data(biometric_df, user_df):
     """Clean and prepare biometric data"""
-    df = biometric_df.copy()
+    df = biometric_df.copy(deep=False)  # Columns are only added or replaced, never written in place
     
     # Convert timestamp to datetime if not already
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     
-    # Add local time columns
+    # Local wall-clock nanoseconds, split into days and time of day in one pass
     df['local_time'] = df['timestamp'].dt.tz_convert(DEFAULT_TIMEZONE)
-    df['hour'] = df['local_time'].dt.hour
-    df['date'] = df['local_time'].dt.date
-    df['day_of_week'] = df['local_time'].dt.day_name()
+    local_ns = df['local_time'].dt.tz_localize(None).to_numpy().astype('datetime64[ns]', copy=False).view(np.int64)
+    local_days, ns_of_day = np.divmod(local_ns, _NS_PER_DAY)
     
-    # Filter for working hours (8am-5pm) and weekdays
+    # Working hours (8am-5pm)
     working_start = time.fromisoformat(WORKING_HOURS['start'])  # 08:00
     working_end = time.fromisoformat(WORKING_HOURS['end'])      # 17:00
     
-    df['is_working_hours'] = df['local_time'].apply(
-        lambda x: working_start <= x.time() <= working_end
+    is_working_hours = (
+        (ns_of_day >= _seconds_since_midnight(working_start) * _NS_PER_SECOND) &
+        (ns_of_day <= _seconds_since_midnight(working_end) * _NS_PER_SECOND)
+    )
+    
+    # Keep weekday, working-hours readings with plausible heart rates, filtering once
+    heart_rate = df['heart_rate'].to_numpy()
+    keep = (
+        is_working_hours &
+        _IS_WEEKDAY[local_days % 7] &
+        (heart_rate >= QUALITY_THRESHOLDS['min_hr']) &
+        (heart_rate <= QUALITY_THRESHOLDS['max_hr'])
     )
+    df = df[keep].copy(deep=False)
+    local_days, ns_of_day = local_days[keep], ns_of_day[keep]
     
-    # Filter for only weekdays and working hours
-    df = df[
-        (df['is_working_hours']) & 
-        (df['day_of_week'].isin(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']))
-    ]
+    # Add local time columns for the kept readings (analyses reuse hour/date rather than re-deriving them)
+    df['hour'] = (ns_of_day // (3600 * _NS_PER_SECOND)).astype(np.int8)
     
-    # Filter outlier heart rates
-    df = df[
-        (df['heart_rate'] >= QUALITY_THRESHOLDS['min_hr']) & 
-        (df['heart_rate'] <= QUALITY_THRESHOLDS['max_hr'])
-    ]
+    # Build a date object per distinct day rather than per reading
+    day_codes, unique_days = pd.factorize(local_days)
+    df['date'] = unique_days.astype('datetime64[D]').astype(object)[day_codes]
+    df['day_of_week'] = _DAY_NAMES[local_days % 7]
+    df['is_working_hours'] = is_working_hours[keep]
+    
+    # Standardize group names on the user table (anything unmatched, or missing, becomes NaN),
+    # as a categorical so group filters and groupbys compare small integer codes
+    users = user_df[['user_id', 'age', 'group']].copy(deep=False)
+    users['standardized_group'] = pd.Categorical(
+        users['group'].str.upper().map(_GROUP_VARIANTS), categories=['DALMUIR', 'KB3', 'KILMALID']
+    )
     
     # Merge with user data (which is already filtered for PR org and relevant groups)
     df = df.merge(
-        user_df[['user_id', 'age', 'group']],
+        users,
         on='user_id',
         how='inner'  # Changed to inner join to keep only matched users
     )
     
-    # Standardize group names
-    def standardize_group(group):
-        if pd.isna(group):
-            return 'Unknown'
-        group = str(group).upper()
-        # Simplified mapping for just our three groups
-        mapping = {
-            'KILMALID': ['KILMALID'],
-            'DALMUIR': ['DALMUIR'],
-            'KB3': ['KB3', 'NOPS']
-        }
-        for std_name, variants in mapping.items():
-            if group.upper() in variants:
-                return std_name
-        return 'Other'
+    # Final filter to ensure only our three groups remain
+    df = df[df['standardized_group'].notna()].copy(deep=False)
     
-    df['standardized_group'] = df['group'].apply(standardize_group)
+    # Compact dtypes: user filters and groupbys compare small integer codes and
+    # heart rate (already bounded by the quality thresholds) fits in int16
+    df['user_id'] = df['user_id'].astype('category')
+    df['heart_rate'] = df['heart_rate'].astype(np.int16)
     
-    # Final filter to ensure only our three groups remain
-    df = df[df['standardized_group'].isin(['KILMALID', 'DALMUIR', 'KB3'])]
+    # Calendar fields shared by the downstream analyses, derived once for the kept readings
+    df['year'] = df['local_time'].dt.year
+    df['month'] = df['local_time'].dt.month
+    df['week'] = df['local_time'].dt.isocalendar().week.astype(np.int8)
     
     # Calculate stress score based purely on heart rate (0-100)
-    def calculate_stress_score(row):
-        if pd.isna(row['age']):
-            max_hr = 180
-        else:
-            max_hr = 220 - row['age']
-            
-        stress_score = ((row['heart_rate'] - QUALITY_THRESHOLDS['min_hr']) / 
-                       (max_hr - QUALITY_THRESHOLDS['min_hr'])) * 100
-                        
-        return max(0, min(100, stress_score))  # Ensure within 0-100 range
-    
-    df['stress_score'] = df.apply(calculate_stress_score, axis=1)
+    df['stress_score'] = _stress_scores(df['heart_rate'].to_numpy(), df['age'].to_numpy(dtype=np.float64))
     
     return df
   
+def sort_readings(df, columns):
+    """Sort readings by columns, returning df itself when already in that order"""
+    if pd.MultiIndex.from_frame(df[columns]).is_monotonic_increasing:
+        return df
+    return df.sort_values(columns)
+
 def calculate_individual_baselines(df):
     """Calculate baseline metrics for each individual"""
-    baselines = {}
-    
-    for user_id in df['user_id'].unique():
-        user_data = df[df['user_id'] == user_id]
-        
-        # Calculate resting heart rate (5th percentile during working hours)
-        resting_hr = user_data[
-            user_data['is_working_hours']
-        ]['heart_rate'].quantile(STRESS_PARAMS['resting_hr_percentile']/100)
-        
-        # Calculate max heart rate based on age
-        age = user_data['age'].iloc[0]
-        if pd.notna(age):
-            max_hr = 220 - age
-        else:
-            max_hr = 180  # Default if age unknown
-            
-        baselines[user_id] = {
-            'resting_hr': resting_hr,
-            'max_hr': max_hr,
-            'hr_reserve': max_hr - resting_hr
+    # Calculate resting heart rate (5th percentile during working hours), one partition
+    # pass but Series.quantile per user so values match the activity cutoffs exactly
+    resting_hr = df[df['is_working_hours']].groupby('user_id', observed=True)['heart_rate'].agg(
+        lambda heart_rate: heart_rate.quantile(STRESS_PARAMS['resting_hr_percentile']/100)
+    )
+    
+    # Calculate max heart rate based on each user's first recorded age
+    age = df.drop_duplicates('user_id').set_index('user_id')['age']
+    max_hr = (220 - age).fillna(180)  # Default if age unknown
+    resting_hr = resting_hr.reindex(age.index)
+    
+    baselines = {
+        user_id: {
+            'resting_hr': resting,
+            'max_hr': maximum,
+            'hr_reserve': maximum - resting
         }
+        for user_id, resting, maximum in zip(age.index, resting_hr, max_hr)
+    }
     
     return baselines
\ No newline at end of file
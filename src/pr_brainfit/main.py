@@ -1,5 +1,6 @@
 # PR_brainfit_analysis/main.py
 import webbrowser
+import html
 import traceback
 from pr_brainfit.analysis.statistical_tests import run_time_comparisons, analyze_group_differences
 from pr_brainfit.analysis.pattern_analysis import analyze_daily_patterns, calculate_group_variance, find_recurring_patterns
@@ -12,6 +13,10 @@ import pandas as pd
 
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
+import plotly.io as pio
+
+# Serialize figures for write_html with orjson's C encoder
+pio.json.config.default_engine = 'orjson'
 
 from pr_brainfit.analysis.metrics import (
     analyze_team_patterns, 
@@ -31,6 +36,9 @@ from pr_brainfit.visualization.advanced_plots import (
 )
 from pr_brainfit.config.settings import *
 
+# Reports load one shared plotly.min.js from output_dir rather than embedding it
+_HTML_OPTS = dict(include_plotlyjs='directory')
+
 output_dir = OUTPUT_DIR
 
 def print_date_ranges(df, original_df):
@@ -107,12 +115,13 @@ def create_key_findings_dashboard(cleaned_df, cask_df, pattern_results, correlat
         'KB3': '#2ca02c'
     }
 
-    # 1. Monthly Volume Trends (Key Chart 6)
-    for site in cask_df['site'].unique():
-        site_data = cask_df[cask_df['site'] == site].copy()
-        
-        # Add receipts line
-        fig.add_trace(
+    # Build each panel's traces, then add them in one call per panel
+    site_groups = list(cask_df.groupby('site', sort=False))
+
+    # 1. Monthly Volume Trends (Key Chart 6): receipts and dispatches lines per site
+    volume_traces = []
+    for site, site_data in site_groups:
+        volume_traces.extend([
             go.Scatter(
                 x=site_data['date'],
                 y=site_data['receipts'],
@@ -120,50 +129,46 @@ def create_key_findings_dashboard(cleaned_df, cask_df, pattern_results, correlat
                 line=dict(color=colors[site], dash='solid'),
                 mode='lines+markers'
             ),
-            row=1, col=1
-        )
-        
-        # Add dispatches line
-        fig.add_trace(
             go.Scatter(
                 x=site_data['date'],
                 y=site_data['dispatches'],
                 name=f"{site} - Dispatches",
                 line=dict(color=colors[site], dash='dot'),
                 mode='lines+markers'
-            ),
-            row=1, col=1
-        )
+            )
+        ])
 
     # 2. Month-over-Month Growth (Key Chart 7)
-    for site in cask_df['site'].unique():
-        site_data = cask_df[cask_df['site'] == site].copy()
-        fig.add_trace(
-            go.Bar(
-                x=site_data['date'],
-                y=site_data['receipts_mom_var'],
-                name=f"{site} MoM Change",
-                marker_color=colors[site]
-            ),
-            row=1, col=2
+    growth_traces = [
+        go.Bar(
+            x=site_data['date'],
+            y=site_data['receipts_mom_var'],
+            name=f"{site} MoM Change",
+            marker_color=colors[site]
         )
+        for site, site_data in site_groups
+    ]
 
     # 3. Volume Consistency (Key Chart 8)
-    for site in cask_df['site'].unique():
-        site_data = cask_df[cask_df['site'] == site].copy()
-        fig.add_trace(
-            go.Box(
-                y=abs(site_data['receipts_mom_var']),
-                name=site,
-                marker_color=colors[site]
-            ),
-            row=2, col=1
+    consistency_traces = [
+        go.Box(
+            y=abs(site_data['receipts_mom_var']),
+            name=site,
+            marker_color=colors[site]
         )
+        for site, site_data in site_groups
+    ]
 
     # 4. Team Working Patterns (Key Chart 3)
     stress_heatmap = create_stress_patterns_heatmap(pattern_results['hourly_patterns'])
-    for trace in stress_heatmap.data:
-        fig.add_trace(trace, row=2, col=2)
+
+    for traces, row, col in [
+        (volume_traces, 1, 1),
+        (growth_traces, 1, 2),
+        (consistency_traces, 2, 1),
+        (list(stress_heatmap.data), 2, 2)
+    ]:
+        fig.add_traces(traces, rows=[row] * len(traces), cols=[col] * len(traces))
 
     # Update layout
     fig.update_layout(
@@ -198,10 +203,23 @@ def create_key_findings_dashboard(cleaned_df, cask_df, pattern_results, correlat
 
     return fig
 
+def write_visualization_index(visualization_paths, index_path):
+    """Write one HTML page that embeds each visualization file in an iframe."""
+    frames = '\n'.join(
+        f'<iframe src="{html.escape(path.name)}" title="{html.escape(path.stem)}"></iframe>'
+        for path in visualization_paths
+    )
+    index_path.write_text(
+        '<!DOCTYPE html>\n'
+        '<html>\n<head>\n<meta charset="utf-8">\n<title>PR Brainfit Analysis</title>\n'
+        '<style>iframe { width: 100%; height: 1300px; border: none; }</style>\n'
+        f'</head>\n<body>\n{frames}\n</body>\n</html>\n'
+    )
+
 def main():
     try:
         print("Loading data...")
-        biometric_df = load_biometric_data(BIOMETRIC_DATA_PATH)
+        biometric_df = load_biometric_data(BIOMETRIC_DATA_PATH, cache_dir=BIOMETRIC_CACHE_DIR)
         user_df = load_user_data()
         cask_df = load_cask_data(CASK_DATA_PATH)
         
@@ -243,22 +261,22 @@ def main():
             layered_analysis=layered_analysis
         )
         key_findings_path = output_dir / 'key_findings_dashboard.html'
-        key_findings.write_html(key_findings_path)
+        key_findings.write_html(key_findings_path, **_HTML_OPTS)
 
         # 2. Daily Patterns Plot
         daily_patterns_plot = create_daily_patterns_plot(layered_analysis['daily_patterns'])
         daily_patterns_path = output_dir / 'productivity_daily_patterns.html'
-        daily_patterns_plot.write_html(daily_patterns_path)
+        daily_patterns_plot.write_html(daily_patterns_path, **_HTML_OPTS)
 
         # 3. Advanced Patterns Plot
         patterns_plot = create_patterns_visualization(daily_patterns, variance_scores)
         patterns_plot_path = output_dir / 'advanced_patterns.html'
-        patterns_plot.write_html(patterns_plot_path)
+        patterns_plot.write_html(patterns_plot_path, **_HTML_OPTS)
         
         # 4. Peak Analysis Plot
         peak_plot = create_peak_visualization(peak_patterns, recovery_metrics)
         peak_plot_path = output_dir / 'peak_analysis.html'
-        peak_plot.write_html(peak_plot_path)
+        peak_plot.write_html(peak_plot_path, **_HTML_OPTS)
 
         # Open all visualizations
         visualization_paths = [
@@ -268,8 +286,10 @@ def main():
             peak_plot_path
         ]
         
-        for path in visualization_paths:
-            webbrowser.open(f'file://{path.absolute()}')
+        # Open a single page framing all of them instead of one browser tab per file
+        index_path = output_dir / 'index.html'
+        write_visualization_index(visualization_paths, index_path)
+        webbrowser.open_new(f'file://{index_path.absolute()}')
         
         print("Analysis complete! All visualizations saved and opened in browser.")
         
@@ -1,72 +1,165 @@
 # PR_brainfit_analysis/visualization/advanced_plots.py
 
+import copy
+from functools import lru_cache
+from types import MappingProxyType
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+from .utils import to_float32
+
+# Consistent colors for groups
+_COLORS = MappingProxyType({
+    'DALMUIR': '#1f77b4',    # blue
+    'KB3': '#2ca02c',        # green
+    'KILMALID': '#ff7f0e'    # orange
+})
+
+# Per-group line and marker styles, shared by every trace of a group (figures copy their trace dicts)
+_LINE_STYLES = {group: {'color': color, 'width': 2} for group, color in _COLORS.items()}
+_MARKER_STYLES = {group: {'size': 8, 'color': color} for group, color in _COLORS.items()}
+_SMALL_MARKER = {'size': 6}
+
+# Working days in display order
+_DAYS_ORDER = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+
+# Side-panel help text for the group and break analysis dashboards
+_GROUP_ANALYSIS_HELP = (
+    "How to read this dashboard:<br>"
+    "• Top left: Lower CV indicates more consistent stress levels<br>"
+    "• Top right: Compare different types of variability across groups<br>"
+    "• Bottom left: How consistency changes throughout the day<br>"
+    "• Bottom right: Statistical differences between groups"
+)
+_BREAK_HELP = (
+    "How to read this dashboard:<br>"
+    "• Top left: Distribution of break durations<br>"
+    "• Top right: When breaks typically occur<br>"
+    "• Bottom left: Average stress reduction during breaks<br>"
+    "• Bottom right: Statistical comparison between groups"
+)
+
+# Line traces longer than this render through WebGL (scattergl) rather than one SVG node per point
+_WEBGL_MIN_POINTS = 1000
+
+# Figures here are assembled as plain trace and layout dicts from our own analysis results and
+# built in one unvalidated go.Figure call, rather than validated property by property
+
+@lru_cache(maxsize=32)
+def _grid_layout(rows, cols, subplot_titles, vertical_spacing=None):
+    """Axis domains and subplot titles of a make_subplots grid, computed once per grid"""
+    layout = make_subplots(
+        rows=rows, cols=cols,
+        subplot_titles=subplot_titles,
+        vertical_spacing=vertical_spacing
+    ).layout.to_plotly_json()
+    layout.pop('template', None)  # Applied by the figure, as for any other
+    return layout
+
+def _subplot_layout(rows, cols, subplot_titles, vertical_spacing=None):
+    """Fresh copy of a make_subplots grid layout for one figure to fill in"""
+    return copy.deepcopy(_grid_layout(rows, cols, subplot_titles, vertical_spacing))
+
+def _axis_suffix(row, col, cols):
+    """Axis name suffix of a grid cell: '' for the first, then '2', '3', ..."""
+    cell = (row - 1) * cols + col
+    return '' if cell == 1 else str(cell)
+
+def _place_traces(traces, row, col, cols):
+    """Point trace dicts at the axes of one grid cell"""
+    suffix = _axis_suffix(row, col, cols)
+    return [dict(trace, xaxis=f'x{suffix}', yaxis=f'y{suffix}') for trace in traces]
+
+def _title_axes(layout, row, col, cols, x_title=None, y_title=None):
+    """Set the axis titles of one grid cell in a layout dict"""
+    suffix = _axis_suffix(row, col, cols)
+    if x_title is not None:
+        layout[f'xaxis{suffix}']['title'] = {'text': x_title}
+    if y_title is not None:
+        layout[f'yaxis{suffix}']['title'] = {'text': y_title}
+
+@lru_cache(maxsize=None)
+def _colorscale(name):
+    """Explicit colour stops for a named colorscale (reversed names like 'RdBu_r' only resolve through validation)"""
+    return go.Heatmap(colorscale=name).to_plotly_json()['colorscale']
+
+def _empty_figure(message):
+    """Figure holding nothing but a centred message, for inputs with no data to plot"""
+    layout = dict(annotations=[dict(
+        text=message,
+        xref="paper", yref="paper",
+        x=0.5, y=0.5,
+        showarrow=False,
+        font=dict(size=14)
+    )])
+    return go.Figure(layout=layout, _validate=False)
+
+def _scatter_type(n_points):
+    """Scatter trace type for a line of n_points: WebGL once SVG rendering would bog down"""
+    return 'scattergl' if n_points > _WEBGL_MIN_POINTS else 'scatter'
 
 def create_patterns_visualization(daily_patterns, variance_scores):
     """Create visualization for daily patterns and variance analysis."""
     
-    # Define consistent colors for groups
-    colors = {
-        'DALMUIR': '#1f77b4',    # blue
-        'KB3': '#2ca02c',        # green
-        'KILMALID': '#ff7f0e'    # orange
-    }
-    
     # Create subplots with 2 rows (removed heatmap)
-    fig = make_subplots(
-        rows=2, cols=1,
-        subplot_titles=(
+    layout = _subplot_layout(
+        2, 1,
+        (
             "Daily Biometric Productivity by Group",
             "Group Variance Analysis"
         ),
         vertical_spacing=0.2
     )
+    data = []
+    
+    # Both inputs are keyed by the same groups; sort them once for both plots
+    groups = sorted(daily_patterns['daily_means'])
     
     # 1. Daily patterns plot with correct day order
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    for group in sorted(daily_patterns['daily_means'].keys()):
-        data = daily_patterns['daily_means'][group]
-        # Reorder data according to days_order
-        ordered_data = pd.Series([data[day] for day in days_order], index=days_order)
+    traces = []
+    for group in groups:
+        group_means = daily_patterns['daily_means'][group]
+        # Reorder data according to _DAYS_ORDER
+        ordered_data = group_means.reindex(_DAYS_ORDER)
         
-        fig.add_trace(
-            go.Scatter(
-                x=days_order,
-                y=ordered_data.values,
+        traces.append(
+            dict(
+                type='scatter',
+                x=_DAYS_ORDER,
+                y=to_float32(ordered_data.values),
                 name=group,
                 mode='lines+markers',
-                line=dict(color=colors[group], width=2),
-                marker=dict(size=8, color=colors[group]),
+                line=_LINE_STYLES[group],
+                marker=_MARKER_STYLES[group],
                 showlegend=False
-            ),
-            row=1, col=1
+            )
         )
+    data.extend(_place_traces(traces, 1, 1, cols=1))
     
     # 2. Variance analysis with consistent colors
-    for group in sorted(variance_scores.keys()):
-        fig.add_trace(
-            go.Bar(
+    traces = []
+    for group in groups:
+        traces.append(
+            dict(
+                type='bar',
                 x=['Within Day', 'Between Day'],
-                y=[
+                y=to_float32([
                     variance_scores[group]['within_day_variance'],
                     variance_scores[group]['between_day_variance']
-                ],
+                ]),
                 name=group,
-                marker_color=colors[group]
-            ),
-            row=2, col=1
+                marker=dict(color=_COLORS[group])
+            )
         )
+    data.extend(_place_traces(traces, 2, 1, cols=1))
     
     # Update layout
-    fig.update_layout(
+    layout.update(
         height=800,  # Reduced height since we removed one subplot
         width=1000,
         showlegend=True,
-        title_text="Days by Day Analysis",
+        title=dict(text="Days by Day Analysis"),
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -77,177 +170,120 @@ def create_patterns_visualization(daily_patterns, variance_scores):
     )
     
     # Update axes labels and formatting
-    fig.update_xaxes(title="Day of Week", row=1, col=1)
-    fig.update_yaxes(title="Biometric Productivity", row=1, col=1)
+    _title_axes(layout, 1, 1, cols=1, x_title="Day of Week", y_title="Biometric Productivity")
+    _title_axes(layout, 2, 1, cols=1, x_title="Variance Type", y_title="Variance Score")
     
-    fig.update_xaxes(title="Variance Type", row=2, col=1)
-    fig.update_yaxes(title="Variance Score", row=2, col=1)
-
-    return fig
+    return go.Figure(data=data, layout=layout, _validate=False)
 
 def create_group_analysis_visualization(consistency_scores, group_variability):
     """Create visualization for group analysis results."""
     if not consistency_scores or not group_variability:
-        # Create empty figure with error message
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for group analysis",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5,
-            showarrow=False,
-            font=dict(size=14)
-        )
-        return fig
+        return _empty_figure("No data available for group analysis")
     
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=(
+    layout = _subplot_layout(
+        2, 2,
+        (
             "Consistency Scores by Group",
             "Variability Metrics",
             "Temporal Consistency",
             "Group Comparisons"
         )
     )
+    data = []
     
     # Consistency scores
-    try:
-        consistency_df = pd.DataFrame(consistency_scores).T
-        if not consistency_df.empty and 'cv_stress' in consistency_df.columns:
-            fig.add_trace(
-                go.Bar(
-                    x=consistency_df.index,
-                    y=consistency_df['cv_stress'],
-                    name='Stress CV',
-                    marker_color='blue'
-                ),
-                row=1, col=1
+    consistency_df = pd.DataFrame(consistency_scores).T
+    if not consistency_df.empty and 'cv_stress' in consistency_df.columns:
+        data.extend(_place_traces([
+            dict(
+                type='bar',
+                x=consistency_df.index,
+                y=to_float32(consistency_df['cv_stress']),
+                name='Stress CV',
+                marker=dict(color='blue')
             )
-            
-            fig.update_xaxes(title_text="Group", row=1, col=1)
-            fig.update_yaxes(title_text="Coefficient of Variation", row=1, col=1)
-    except Exception as e:
-        print(f"Warning: Could not create consistency score plot: {str(e)}")
-        fig.add_annotation(
-            text="Error creating consistency scores plot",
-            xref="x", yref="y",
-            x=0.5, y=0.5,
-            showarrow=False,
-            row=1, col=1
-        )
+        ], 1, 1, cols=2))
+        
+        _title_axes(layout, 1, 1, cols=2, x_title="Group", y_title="Coefficient of Variation")
     
     # Variability metrics
-    try:
-        for group, metrics in group_variability.items():
-            if isinstance(metrics, dict) and 'stability_score' in metrics:
-                fig.add_trace(
-                    go.Scatter(
-                        x=['Intraday', 'Interday', 'User', 'Stability'],
-                        y=[
-                            metrics.get('intraday_variability', 0),
-                            metrics.get('interday_variability', 0),
-                            metrics.get('user_variability', 0),
-                            metrics.get('stability_score', 0)
-                        ],
-                        name=group,
-                        mode='lines+markers'
-                    ),
-                    row=1, col=2
+    traces = []
+    for group, metrics in group_variability.items():
+        if isinstance(metrics, dict) and 'stability_score' in metrics:
+            traces.append(
+                dict(
+                    type='scatter',
+                    x=['Intraday', 'Interday', 'User', 'Stability'],
+                    y=to_float32([
+                        metrics.get('intraday_variability', 0),
+                        metrics.get('interday_variability', 0),
+                        metrics.get('user_variability', 0),
+                        metrics.get('stability_score', 0)
+                    ]),
+                    name=group,
+                    mode='lines+markers'
                 )
-                
-        fig.update_xaxes(title_text="Metric Type", row=1, col=2)
-        fig.update_yaxes(title_text="Variability Score", row=1, col=2)
-    except Exception as e:
-        print(f"Warning: Could not create variability metrics plot: {str(e)}")
-        fig.add_annotation(
-            text="Error creating variability metrics plot",
-            xref="x2", yref="y2",
-            x=0.5, y=0.5,
-            showarrow=False,
-            row=1, col=2
-        )
+            )
+    data.extend(_place_traces(traces, 1, 2, cols=2))
+    
+    _title_axes(layout, 1, 2, cols=2, x_title="Metric Type", y_title="Variability Score")
     
     # Temporal consistency
-    try:
-        if consistency_scores and any('temporal_consistency' in scores for scores in consistency_scores.values()):
-            for group, scores in consistency_scores.items():
-                if 'temporal_consistency' in scores:
-                    fig.add_trace(
-                        go.Scatter(
-                            x=list(range(24)),
-                            y=[scores['temporal_consistency']] * 24,
-                            name=f"{group} Consistency",
-                            mode='lines'
-                        ),
-                        row=2, col=1
+    if consistency_scores and any('temporal_consistency' in scores for scores in consistency_scores.values()):
+        traces = []
+        for group, scores in consistency_scores.items():
+            if 'temporal_consistency' in scores:
+                traces.append(
+                    dict(
+                        type='scatter',
+                        x=list(range(24)),
+                        y=np.full(24, scores['temporal_consistency'], dtype=np.float32),
+                        name=f"{group} Consistency",
+                        mode='lines'
                     )
-            
-            fig.update_xaxes(title_text="Hour of Day", row=2, col=1)
-            fig.update_yaxes(title_text="Consistency Score", row=2, col=1)
-    except Exception as e:
-        print(f"Warning: Could not create temporal consistency plot: {str(e)}")
-        fig.add_annotation(
-            text="Error creating temporal consistency plot",
-            xref="x3", yref="y3",
-            x=0.5, y=0.5,
-            showarrow=False,
-            row=2, col=1
-        )
+                )
+        data.extend(_place_traces(traces, 2, 1, cols=2))
+        
+        _title_axes(layout, 2, 1, cols=2, x_title="Hour of Day", y_title="Consistency Score")
     
     # Group comparisons heatmap
-    try:
-        comparison_data = []
-        groups = list(consistency_scores.keys())
-        for i, group1 in enumerate(groups):
-            for j, group2 in enumerate(groups):
-                if i < j:
-                    key = f'{group1}_vs_{group2}'
-                    if key in group_variability:
-                        comparison_data.append({
-                            'group1': group1,
-                            'group2': group2,
-                            'difference': group_variability[key].get('levene_statistic', 0)
-                        })
+    comparison_data = {}
+    groups = list(consistency_scores.keys())
+    for i, group1 in enumerate(groups):
+        for j, group2 in enumerate(groups):
+            if i < j:
+                key = f'{group1}_vs_{group2}'
+                if key in group_variability:
+                    comparison_data[group1, group2] = group_variability[key].get('levene_statistic', 0)
+    
+    if comparison_data:
+        # Fill the (tiny) comparison matrix directly, labelled like a pivot of group1 x group2
+        row_groups = sorted({group1 for group1, _ in comparison_data})
+        col_groups = sorted({group2 for _, group2 in comparison_data})
+        heatmap_values = np.zeros((len(row_groups), len(col_groups)))
+        for (group1, group2), difference in comparison_data.items():
+            heatmap_values[row_groups.index(group1), col_groups.index(group2)] = difference
+        heatmap_values[np.isnan(heatmap_values)] = 0
         
-        if comparison_data:
-            comparison_df = pd.DataFrame(comparison_data)
-            heatmap_data = pd.pivot_table(
-                comparison_df,
-                values='difference',
-                index='group1',
-                columns='group2',
-                fill_value=0
+        data.extend(_place_traces([
+            dict(
+                type='heatmap',
+                z=to_float32(heatmap_values),
+                x=col_groups,
+                y=row_groups,
+                colorscale=_colorscale('RdBu_r'),
+                showscale=True
             )
-            
-            fig.add_trace(
-                go.Heatmap(
-                    z=heatmap_data.values,
-                    x=heatmap_data.columns,
-                    y=heatmap_data.index,
-                    colorscale='RdBu_r',
-                    showscale=True
-                ),
-                row=2, col=2
-            )
-            
-            fig.update_xaxes(title_text="Group 2", row=2, col=2)
-            fig.update_yaxes(title_text="Group 1", row=2, col=2)
-    except Exception as e:
-        print(f"Warning: Could not create group comparisons heatmap: {str(e)}")
-        fig.add_annotation(
-            text="Error creating group comparisons plot",
-            xref="x4", yref="y4",
-            x=0.5, y=0.5,
-            showarrow=False,
-            row=2, col=2
-        )
+        ], 2, 2, cols=2))
+        
+        _title_axes(layout, 2, 2, cols=2, x_title="Group 2", y_title="Group 1")
     
     # Update layout
-    fig.update_layout(
+    layout.update(
         height=1000,
         width=1200,
         showlegend=True,
-        title_text="Group Analysis Results",
-        title_x=0.5,
+        title=dict(text="Group Analysis Results", x=0.5),
         legend=dict(
             yanchor="top",
             y=0.99,
@@ -258,14 +294,8 @@ def create_group_analysis_visualization(consistency_scores, group_variability):
     )
     
     # Add explanatory annotations
-    fig.add_annotation(
-        text=(
-            "How to read this dashboard:<br>" +
-            "• Top left: Lower CV indicates more consistent stress levels<br>" +
-            "• Top right: Compare different types of variability across groups<br>" +
-            "• Bottom left: How consistency changes throughout the day<br>" +
-            "• Bottom right: Statistical differences between groups"
-        ),
+    layout['annotations'].append(dict(
+        text=_GROUP_ANALYSIS_HELP,
         xref="paper", yref="paper",
         x=1.15, y=0.5,
         showarrow=False,
@@ -273,186 +303,180 @@ def create_group_analysis_visualization(consistency_scores, group_variability):
         bgcolor="white",
         bordercolor="black",
         borderwidth=1
-    )
+    ))
     
-    return fig
+    return go.Figure(data=data, layout=layout, _validate=False)
 
 def create_activity_visualization(activity_stats, transition_probs):
     """Create visualization for activity analysis results."""
+    if not activity_stats and not transition_probs:
+        return _empty_figure("No data available for activity analysis")
     
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=(
+    layout = _subplot_layout(
+        2, 2,
+        (
             "Activity Distribution by Group",
             "Activity Transitions",
             "Hourly Activity Patterns",
             "Activity Level Stability"
         )
     )
+    data = []
     
     # Activity distribution
+    traces = []
     for group, stats in activity_stats.items():
-        fig.add_trace(
-            go.Bar(
-                x=list(stats['overall_distribution'].keys()),
-                y=list(stats['overall_distribution'].values()),
+        distribution = stats['overall_distribution']
+        traces.append(
+            dict(
+                type='bar',
+                x=np.fromiter(distribution.keys(), dtype=object, count=len(distribution)),
+                y=np.fromiter(distribution.values(), dtype=np.float32, count=len(distribution)),
                 name=group
-            ),
-            row=1, col=1
+            )
         )
+    data.extend(_place_traces(traces, 1, 1, cols=2))
     
     # Transition probabilities
+    traces = []
     for group, probs in transition_probs.items():
         matrix = probs['matrix']
-        fig.add_trace(
-            go.Heatmap(
-                z=matrix.values,
+        traces.append(
+            dict(
+                type='heatmap',
+                z=np.ascontiguousarray(matrix.values, dtype=np.float32),
                 x=matrix.columns,
                 y=matrix.index,
-                colorscale='Viridis',
+                colorscale=_colorscale('Viridis'),
                 name=f"{group} Transitions"
-            ),
-            row=1, col=2
+            )
         )
+    data.extend(_place_traces(traces, 1, 2, cols=2))
     
     # Hourly patterns
+    traces = []
     for group, stats in activity_stats.items():
         hourly_dist = stats['hourly_distribution']
-        fig.add_trace(
-            go.Heatmap(
-                z=hourly_dist.values,
+        traces.append(
+            dict(
+                type='heatmap',
+                z=np.ascontiguousarray(hourly_dist.values, dtype=np.float32),  # Row-major, as z is serialized row by row
                 x=hourly_dist.columns,
                 y=hourly_dist.index,
-                colorscale='Viridis',
+                colorscale=_colorscale('Viridis'),
                 name=f"{group} Hourly"
-            ),
-            row=2, col=1
+            )
         )
+    data.extend(_place_traces(traces, 2, 1, cols=2))
     
     # Activity stability
+    traces = []
     for group, probs in transition_probs.items():
         steady_state = probs['steady_state']
-        fig.add_trace(
-            go.Bar(
+        traces.append(
+            dict(
+                type='bar',
                 x=steady_state.index,
-                y=steady_state.values,
+                y=to_float32(steady_state.values),
                 name=f"{group} Steady State"
-            ),
-            row=2, col=2
+            )
         )
+    data.extend(_place_traces(traces, 2, 2, cols=2))
     
-    fig.update_layout(
+    layout.update(
         height=1000,
         showlegend=True,
-        title_text="Activity Analysis Results"
+        title=dict(text="Activity Analysis Results")
     )
     
-    return fig
+    return go.Figure(data=data, layout=layout, _validate=False)
 
 
 def create_break_visualization(break_patterns, break_comparisons):
     """Create visualization for break analysis results."""
     if not break_patterns or not break_comparisons:
-        # Create empty figure with error message
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for break analysis",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5,
-            showarrow=False,
-            font=dict(size=14)
-        )
-        return fig
+        return _empty_figure("No data available for break analysis")
 
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=(
+    layout = _subplot_layout(
+        2, 2,
+        (
             "Break Duration Distribution",
             "Break Timing Patterns",
             "Stress Reduction During Breaks",
             "Group Comparisons"
         )
     )
+    data = []
     
     # Break duration distribution
-    try:
-        for group, patterns in break_patterns.items():
-            if 'duration_distribution' in patterns:
-                fig.add_trace(
-                    go.Box(
-                        y=patterns['duration_distribution'],
-                        name=group
-                    ),
-                    row=1, col=1
+    traces = []
+    for group, patterns in break_patterns.items():
+        if 'duration_distribution' in patterns:
+            traces.append(
+                dict(
+                    type='box',
+                    y=to_float32(patterns['duration_distribution']),
+                    name=group
                 )
-        fig.update_yaxes(title_text="Duration (minutes)", row=1, col=1)
-    except Exception as e:
-        print(f"Warning: Could not create duration distribution plot: {str(e)}")
+            )
+    data.extend(_place_traces(traces, 1, 1, cols=2))
+    _title_axes(layout, 1, 1, cols=2, y_title="Duration (minutes)")
 
     # Break timing patterns
-    try:
-        for group, patterns in break_patterns.items():
-            if 'common_times' in patterns:
-                fig.add_trace(
-                    go.Bar(
-                        x=patterns['common_times'].index,
-                        y=patterns['common_times'].values,
-                        name=group
-                    ),
-                    row=1, col=2
+    traces = []
+    for group, patterns in break_patterns.items():
+        if 'common_times' in patterns:
+            traces.append(
+                dict(
+                    type='bar',
+                    x=patterns['common_times'].index,
+                    y=patterns['common_times'].values,
+                    name=group
                 )
-        fig.update_xaxes(title_text="Hour of Day", row=1, col=2)
-        fig.update_yaxes(title_text="Break Frequency", row=1, col=2)
-    except Exception as e:
-        print(f"Warning: Could not create timing patterns plot: {str(e)}")
+            )
+    data.extend(_place_traces(traces, 1, 2, cols=2))
+    _title_axes(layout, 1, 2, cols=2, x_title="Hour of Day", y_title="Break Frequency")
 
     # Stress reduction
-    try:
-        stress_reduction = {
-            group: patterns.get('stress_reduction', 0)
-            for group, patterns in break_patterns.items()
-        }
-        fig.add_trace(
-            go.Bar(
-                x=list(stress_reduction.keys()),
-                y=list(stress_reduction.values()),
-                name='Stress Reduction'
-            ),
-            row=2, col=1
+    stress_reduction = {
+        group: patterns.get('stress_reduction', 0)
+        for group, patterns in break_patterns.items()
+    }
+    data.extend(_place_traces([
+        dict(
+            type='bar',
+            x=list(stress_reduction.keys()),
+            y=to_float32(list(stress_reduction.values())),
+            name='Stress Reduction'
         )
-        fig.update_yaxes(title_text="Stress Reduction (%)", row=2, col=1)
-    except Exception as e:
-        print(f"Warning: Could not create stress reduction plot: {str(e)}")
+    ], 2, 1, cols=2))
+    _title_axes(layout, 2, 1, cols=2, y_title="Stress Reduction (%)")
 
     # Group comparisons
-    try:
-        comparison_data = pd.DataFrame(break_comparisons).T
-        fig.add_trace(
-            go.Scatter(
-                x=comparison_data.index,
-                y=comparison_data.get('duration_difference', [0] * len(comparison_data)),
-                mode='markers',
-                marker=dict(
-                    size=10,
-                    color=comparison_data.get('p_value', [1] * len(comparison_data)),
-                    colorscale='RdBu',
-                    showscale=True
-                ),
-                name='Break Duration Difference'
+    comparison_data = pd.DataFrame(break_comparisons).T
+    data.extend(_place_traces([
+        dict(
+            type='scatter',
+            x=comparison_data.index,
+            y=to_float32(comparison_data.get('duration_difference', [0] * len(comparison_data))),
+            mode='markers',
+            marker=dict(
+                size=10,
+                color=comparison_data.get('p_value', [1] * len(comparison_data)),
+                colorscale=_colorscale('RdBu'),
+                showscale=True
             ),
-            row=2, col=2
+            name='Break Duration Difference'
         )
-        fig.update_yaxes(title_text="Duration Difference", row=2, col=2)
-    except Exception as e:
-        print(f"Warning: Could not create group comparisons plot: {str(e)}")
+    ], 2, 2, cols=2))
+    _title_axes(layout, 2, 2, cols=2, y_title="Duration Difference")
 
     # Update layout
-    fig.update_layout(
+    layout.update(
         height=1000,
         width=1200,
         showlegend=True,
-        title_text="Break Analysis Results",
-        title_x=0.5,
+        title=dict(text="Break Analysis Results", x=0.5),
         legend=dict(
             yanchor="top",
             y=0.99,
@@ -463,14 +487,8 @@ def create_break_visualization(break_patterns, break_comparisons):
     )
 
     # Add explanatory annotations
-    fig.add_annotation(
-        text=(
-            "How to read this dashboard:<br>" +
-            "• Top left: Distribution of break durations<br>" +
-            "• Top right: When breaks typically occur<br>" +
-            "• Bottom left: Average stress reduction during breaks<br>" +
-            "• Bottom right: Statistical comparison between groups"
-        ),
+    layout['annotations'].append(dict(
+        text=_BREAK_HELP,
         xref="paper", yref="paper",
         x=1.15, y=0.5,
         showarrow=False,
@@ -478,100 +496,98 @@ def create_break_visualization(break_patterns, break_comparisons):
         bgcolor="white",
         bordercolor="black",
         borderwidth=1
-    )
+    ))
 
-    return fig
+    return go.Figure(data=data, layout=layout, _validate=False)
 
 
 def create_time_patterns_plot(time_patterns):
     """Create visualization of time-of-day patterns split by productivity levels."""
     
-    # Define consistent colors for groups
-    colors = {
-        'DALMUIR': '#1f77b4',    # blue
-        'KB3': '#2ca02c',        # green
-        'KILMALID': '#ff7f0e'    # orange
-    }
-    
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=(
+    layout = _subplot_layout(
+        2, 2,
+        (
             "Biometric Productivity - High Productivity Periods",
             "Biometric Productivity - Normal Productivity Periods",
             "Pattern Comparison"
         ),
         vertical_spacing=0.15
     )
+    data = []
 
-    # Separate high and normal productivity periods
-    high_prod = time_patterns[time_patterns['is_high_prod']]
-    normal_prod = time_patterns[~time_patterns['is_high_prod']]
+    # Separate high and normal productivity periods by group, in a single groupby
+    splits = dict(list(time_patterns.groupby(['is_high_prod', 'standardized_group'], observed=True)))
+    high_prod = {group: group_data for (is_high_prod, group), group_data in splits.items() if is_high_prod}
+    normal_prod = {group: group_data for (is_high_prod, group), group_data in splits.items() if not is_high_prod}
 
     # High productivity patterns
-    for group in sorted(high_prod['standardized_group'].unique()):
-        group_data = high_prod[high_prod['standardized_group'] == group]
+    traces = []
+    for group, group_data in high_prod.items():
         
-        fig.add_trace(
-            go.Scatter(
+        traces.append(
+            dict(
+                type=_scatter_type(len(group_data)),
                 x=group_data['time_of_day'],
-                y=group_data['stress_score_mean'],
+                y=to_float32(group_data['stress_score_mean']),
                 name=group,
                 mode='lines+markers',
-                line=dict(color=colors[group], width=2),
-                marker=dict(size=6),
+                line=_LINE_STYLES[group],
+                marker=_SMALL_MARKER,
                 showlegend=True
-            ),
-            row=1, col=1
+            )
         )
+    data.extend(_place_traces(traces, 1, 1, cols=2))
 
     # Normal productivity patterns
-    for group in sorted(normal_prod['standardized_group'].unique()):
-        group_data = normal_prod[normal_prod['standardized_group'] == group]
+    traces = []
+    for group, group_data in normal_prod.items():
         
-        fig.add_trace(
-            go.Scatter(
+        traces.append(
+            dict(
+                type=_scatter_type(len(group_data)),
                 x=group_data['time_of_day'],
-                y=group_data['stress_score_mean'],
+                y=to_float32(group_data['stress_score_mean']),
                 name=group,
                 mode='lines+markers',
-                line=dict(color=colors[group], width=2),
-                marker=dict(size=6),
+                line=_LINE_STYLES[group],
+                marker=_SMALL_MARKER,
                 showlegend=False
-            ),
-            row=1, col=2
+            )
         )
+    data.extend(_place_traces(traces, 1, 2, cols=2))
 
     # Pattern comparison (difference)
+    # Pivot high/normal means side by side once instead of merging per group
+    wide = time_patterns.pivot(
+        index=['standardized_group', 'time_of_day'],
+        columns='is_high_prod',
+        values='stress_score_mean'
+    ).reindex(columns=[True, False])
+    difference = (wide[True] - wide[False]).dropna()
+    group_differences = dict(list(difference.groupby(level='standardized_group', sort=False, observed=True)))
+    traces = []
     for group in time_patterns['standardized_group'].unique():
-        group_high = high_prod[high_prod['standardized_group'] == group]
-        group_normal = normal_prod[normal_prod['standardized_group'] == group]
+        comparison = group_differences.get(group, difference.iloc[:0])
         
-        # Merge on time_of_day to calculate difference
-        comparison = pd.merge(
-            group_high, 
-            group_normal, 
-            on='time_of_day',
-            suffixes=('_high', '_normal')
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=comparison['time_of_day'],
-                y=comparison['stress_score_mean_high'] - comparison['stress_score_mean_normal'],
+        traces.append(
+            dict(
+                type=_scatter_type(len(comparison)),
+                x=comparison.index.get_level_values('time_of_day'),
+                y=to_float32(comparison.values),
                 name=group,
                 mode='lines+markers',
-                line=dict(color=colors[group], width=2),
-                marker=dict(size=6),
+                line=_LINE_STYLES[group],
+                marker=_SMALL_MARKER,
                 showlegend=False
-            ),
-            row=2, col=1
+            )
         )
+    data.extend(_place_traces(traces, 2, 1, cols=2))
 
     # Update layout
-    fig.update_layout(
+    layout.update(
         height=800,  # Reduced height since we removed participation chart
         showlegend=True,
-        title_text="Time-of-Day Patterns by Productivity Level",
+        title=dict(text="Time-of-Day Patterns by Productivity Level"),
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -582,71 +598,44 @@ def create_time_patterns_plot(time_patterns):
     )
 
     # Update axes labels
-    fig.update_xaxes(title="Time of Day", row=2, col=1)
-    fig.update_xaxes(title="Time of Day", row=1, col=1)
-    fig.update_xaxes(title="Time of Day", row=1, col=2)
+    _title_axes(layout, 1, 1, cols=2, x_title="Time of Day", y_title="Biometric Productivity")
+    _title_axes(layout, 1, 2, cols=2, x_title="Time of Day", y_title="Biometric Productivity")
+    _title_axes(layout, 2, 1, cols=2, x_title="Time of Day", y_title="Difference in Biometric Productivity")
     
-    fig.update_yaxes(title="Biometric Productivity", row=1, col=1)
-    fig.update_yaxes(title="Biometric Productivity", row=1, col=2)
-    fig.update_yaxes(title="Difference in Biometric Productivity", row=2, col=1)
-
-    return fig
+    return go.Figure(data=data, layout=layout, _validate=False)
 
 
 def create_peak_visualization(peak_patterns, recovery_metrics):
     """Create visualization for peak analysis focusing on time distribution."""
     
-    # Define consistent colors for groups
-    colors = {
-        'DALMUIR': '#1f77b4',    # blue
-        'KB3': '#2ca02c',        # green
-        'KILMALID': '#ff7f0e'    # orange
-    }
-    
-    # Create single plot
-    fig = go.Figure()
-    
     # Define working hours
     working_hours = range(8, 18)  # 8am to 5pm (17:00)
     
-    # Add bar plots for each group
+    # Add one filled line per group
+    traces = []
     for group in sorted(peak_patterns.keys()):
         distribution = peak_patterns[group]['peak_distribution']
         
         # Create working hours range with zeros for missing hours
-        working_hours_data = pd.Series(0, index=working_hours)
-        working_hours_data.update(distribution[distribution.index.isin(working_hours)])
+        working_hours_data = distribution.reindex(working_hours, fill_value=0)
         
-        # Add bar plot
-        fig.add_trace(
-            go.Bar(
+        # Shade the area under the line rather than overlaying bars on the same values
+        traces.append(
+            dict(
+                type='scatter',
                 x=working_hours_data.index,
                 y=working_hours_data.values,
                 name=f"{group} - Peaks",
-                marker_color=colors[group],
-                opacity=0.7
-            )
-        )
-        
-        # Add line plot connecting peaks
-        fig.add_trace(
-            go.Scatter(
-                x=working_hours_data.index,
-                y=working_hours_data.values,
-                name=f"{group} - Trend",
-                line=dict(
-                    color=colors[group],
-                    width=2
-                ),
-                mode='lines'
+                line=_LINE_STYLES[group],
+                mode='lines',
+                fill='tozeroy',
+                opacity=0.5
             )
         )
 
-    # Update layout
-    fig.update_layout(
-        title="Peak Distribution Throughout the Working Day",
-        xaxis_title="Hour of Day",
-        yaxis_title="Number of Peaks",
+    # Single plot layout, with light grid lines on both axes
+    layout = dict(
+        title=dict(text="Peak Distribution Throughout the Working Day"),
         height=600,
         width=1000,
         showlegend=True,
@@ -658,27 +647,23 @@ def create_peak_visualization(peak_patterns, recovery_metrics):
             x=1
         ),
         xaxis=dict(
+            title=dict(text="Hour of Day"),
             tickmode='array',
             ticktext=[f'{i:02d}:00' for i in working_hours],
             tickvals=list(working_hours),
             tickangle=90,
-            range=[7.5, 17.5]  # Set range to show 8am-5pm with some padding
+            range=[7.5, 17.5],  # Set range to show 8am-5pm with some padding
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='lightgrey'
         ),
-        plot_bgcolor='white',
-        bargap=0.15
-    )
-    
-    # Update axes
-    fig.update_xaxes(
-        showgrid=True,
-        gridwidth=1,
-        gridcolor='lightgrey'
+        yaxis=dict(
+            title=dict(text="Number of Peaks"),
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='lightgrey'
+        ),
+        plot_bgcolor='white'
     )
     
-    fig.update_yaxes(
-        showgrid=True,
-        gridwidth=1,
-        gridcolor='lightgrey'
-    )
-
-    return fig
+    return go.Figure(data=traces, layout=layout, _validate=False)
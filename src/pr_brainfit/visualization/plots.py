@@ -1,15 +1,47 @@
 # PR_brainfit_analysis/visualization/plots.py
 
+from functools import lru_cache
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 from ..config.settings import *
+from ..analysis.activity_analysis import ACTIVITY_LEVELS
+from .utils import to_float32
 import matplotlib
 import matplotlib.colors
 
-def create_stress_patterns_plot(hourly_patterns):
-    """Create 15-min interval body stress pattern visualization for PR teams"""
+# Color scheme for groups, and the translucent fill of each group's standard deviation band
+_GROUP_COLORS = {
+    'DALMUIR': '#1f77b4',    # blue
+    'KB3': '#2ca02c',        # green
+    'KILMALID': '#ff7f0e'    # orange
+}
+_FILL_RGBA = {
+    group: f'rgba{tuple(list(matplotlib.colors.to_rgb(color)) + [0.2])}'
+    for group, color in _GROUP_COLORS.items()
+}
+
+def _activity_count_array(patterns_df):
+    """Per-slot activity_level count dicts as a (slots, levels) float array"""
+    return np.array(
+        [[levels[activity] for activity in ACTIVITY_LEVELS] for levels in patterns_df['activity_level']],
+        dtype=float
+    ).reshape(-1, len(ACTIVITY_LEVELS))
+
+def _activity_percentages(counts):
+    """Percentage of each slot's readings at every level, then at any active (non-sedentary) level"""
+    totals = counts.sum(axis=1)
+    percentages = np.empty((len(counts), len(ACTIVITY_LEVELS) + 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(counts, totals[:, None], out=percentages[:, :-1])
+        np.divide(counts[:, 1:].sum(axis=1), totals, out=percentages[:, -1])
+    percentages *= 100
+    return percentages
+
+def _stress_patterns_traces(hourly_patterns):
+    """Mean line and standard deviation band traces of each PR team's stress pattern"""
     # Filter for PR groups only
     pr_groups = ['DALMUIR', 'KILMALID', 'KB3']
     filtered_data = hourly_patterns[hourly_patterns['standardized_group'].isin(pr_groups)]
@@ -17,56 +49,60 @@ def create_stress_patterns_plot(hourly_patterns):
     # Make sure data is sorted by time
     filtered_data = filtered_data.sort_values(['standardized_group', 'time'])
     
-    fig = go.Figure()
+    traces = []
     
-    # Color scheme for groups
-    colors = {
-        'DALMUIR': '#1f77b4',    # blue
-        'KB3': '#2ca02c',        # green
-        'KILMALID': '#ff7f0e'    # orange
-    }
-    
-    for group in filtered_data['standardized_group'].unique():
-        group_data = filtered_data[filtered_data['standardized_group'] == group]
+    for group, group_data in filtered_data.groupby('standardized_group', sort=False, observed=True):
+        # Pull each column out once and compute the band edges as plain arrays
+        time = group_data['time'].to_numpy()
+        stress_mean = group_data['stress_mean'].to_numpy()
+        stress_std = group_data['stress_std'].to_numpy()
+        upper = to_float32(stress_mean + stress_std)
+        lower = to_float32(stress_mean - stress_std)
         
         # Add mean line
-        fig.add_trace(go.Scatter(
-            x=group_data['time'],
-            y=group_data['stress_mean'],
+        traces.append(go.Scatter(
+            x=time,
+            y=to_float32(stress_mean),
             name=f"{group} - Mean",
             mode='lines+markers',
             line=dict(
-                color=colors[group],
+                color=_GROUP_COLORS[group],
                 width=2
             ),
             marker=dict(
                 size=8,
-                color=colors[group]
+                color=_GROUP_COLORS[group]
             ),
             showlegend=True
         ))
         
         # Add standard deviation range
-        fig.add_trace(go.Scatter(
-            x=group_data['time'],
-            y=group_data['stress_mean'] + group_data['stress_std'],
+        traces.append(go.Scatter(
+            x=time,
+            y=upper,
             name=f"{group} - Upper",
             mode='lines',
             line=dict(width=0),
             showlegend=False
         ))
         
-        fig.add_trace(go.Scatter(
-            x=group_data['time'],
-            y=group_data['stress_mean'] - group_data['stress_std'],
+        traces.append(go.Scatter(
+            x=time,
+            y=lower,
             name=f"{group} - Lower",
             mode='lines',
             line=dict(width=0),
             fill='tonexty',
-            fillcolor=f'rgba{tuple(list(matplotlib.colors.to_rgb(colors[group])) + [0.2])}',
+            fillcolor=_FILL_RGBA[group],
             showlegend=False
         ))
     
+    return traces
+
+def create_stress_patterns_plot(hourly_patterns):
+    """Create 15-min interval body stress pattern visualization for PR teams"""
+    fig = go.Figure(_stress_patterns_traces(hourly_patterns))
+    
     # Update layout with expanded time range
     fig.update_layout(
         title="Team Body Stress Patterns Throughout Working Hours",
@@ -94,45 +130,37 @@ def create_stress_patterns_plot(hourly_patterns):
     
     return fig
 
-def create_stress_patterns_heatmap(patterns):
-    """Create heat map visualization of body stress patterns for PR teams"""
+def _stress_heatmap_pivot(patterns):
+    """PR teams' mean stress with one row per group and one column per time slot"""
     # Filter for PR groups only
     pr_groups = ['DALMUIR', 'KILMALID', 'KB3']
     filtered_data = patterns[patterns['standardized_group'].isin(pr_groups)]
     
-    # Create heat map data
-    heatmap_data = []
-    
-    for group in pr_groups:
-        group_data = filtered_data[filtered_data['standardized_group'] == group]
-        for _, row in group_data.iterrows():
-            heatmap_data.append({
-                'group': group,
-                'time': row['time'],
-                'stress': row['stress_mean']
-            })
-    
-    # Convert to DataFrame for plotting
-    heatmap_df = pd.DataFrame(heatmap_data)
-    
-    # Pivot the data for the heatmap
-    pivot_data = heatmap_df.pivot(
-        index='group',
+    return filtered_data.pivot(
+        index='standardized_group',
         columns='time',
-        values='stress'
+        values='stress_mean'
+    ).sort_index()
+
+def _stress_heatmap_trace(pivot_data):
+    """Stress heatmap trace of a group by time slot pivot"""
+    return go.Heatmap(
+        z=np.ascontiguousarray(pivot_data.values, dtype=np.float32),
+        x=pivot_data.columns.to_numpy(),
+        y=pivot_data.index.to_numpy(),
+        colorscale='RdYlBu_r',
+        showscale=False  # No colorbar
     )
+
+def create_stress_patterns_heatmap(patterns):
+    """Create heat map visualization of body stress patterns for PR teams"""
+    pivot_data = _stress_heatmap_pivot(patterns)
+    
+    # Label every 4th time point
+    tick_times = list(map(str, pivot_data.columns[::4]))
     
     # Create single heatmap
-    fig = go.Figure(
-        go.Heatmap(
-            z=pivot_data.values,
-            x=pivot_data.columns,
-            y=pivot_data.index,
-            colorscale='RdYlBu_r',
-            showscale=False,  # First attempt to remove colorbar
-            colorbar=None     # Explicitly set colorbar to None
-        )
-    )
+    fig = go.Figure(_stress_heatmap_trace(pivot_data))
     
     # Update layout
     fig.update_layout(
@@ -141,10 +169,11 @@ def create_stress_patterns_heatmap(patterns):
         width=1200,
         xaxis=dict(
             title="Time of Day",
+            type='category',
             tickangle=45,
             tickmode='array',
-            ticktext=pivot_data.columns[::4],  # Show every 4th time point
-            tickvals=pivot_data.columns[::4],
+            ticktext=tick_times,
+            tickvals=tick_times,
             gridcolor='lightgrey'
         ),
         yaxis=dict(
@@ -156,18 +185,10 @@ def create_stress_patterns_heatmap(patterns):
     
     return fig
 
-def create_activity_distribution_plot(patterns_df):
-    """Create activity level distribution plot by team in 15-min intervals"""
+def _activity_distribution_traces(patterns_df):
+    """Stacked activity bars and trend line traces of each PR team, with their subplot rows"""
     pr_groups = ['DALMUIR', 'KILMALID', 'KB3']
     
-    # Create subplots - one row per group
-    fig = make_subplots(
-        rows=3, cols=1,
-        subplot_titles=[f"{group} Activity Distribution" for group in pr_groups],
-        shared_xaxes=True,
-        vertical_spacing=0.08
-    )
-    
     # Softer colors
     colors = {
         'intense': '#ff6666',     # stronger red
@@ -176,38 +197,57 @@ def create_activity_distribution_plot(patterns_df):
         'sedentary': '#66b3ff'    # stronger blue
     }
     
+    # Each level's share of every slot, plus the active share in the last column
+    activity_pct = _activity_percentages(_activity_count_array(patterns_df))
+    
+    # Row positions of each group, from a single groupby
+    group_rows = patterns_df.groupby('standardized_group', sort=False, observed=True).indices
+    
     # Add stacked bars for each group
+    traces, rows = [], []
     for i, group in enumerate(pr_groups, 1):
-        group_data = patterns_df[patterns_df['standardized_group'] == group]
+        in_group = group_rows.get(group, np.array([], dtype=np.intp))
+        group_data = patterns_df.iloc[in_group]
         
-        for activity in ['sedentary', 'light', 'moderate', 'intense']:
-            fig.add_trace(
+        for k, activity in enumerate(ACTIVITY_LEVELS):
+            traces.append(
                 go.Bar(
                     name=activity.capitalize(),
                     x=group_data['time'],
-                    y=[d[activity]/sum(d.values())*100 for d in group_data['activity_level']],
+                    y=to_float32(activity_pct[in_group, k]),
                     marker_color=colors[activity],
                     showlegend=(i==1)
-                ),
-                row=i, col=1
+                )
             )
             
-        # Calculate and add trend line of total activity
-        active_pct = [
-            sum(d[k] for k in ['light','moderate','intense'])/sum(d.values())*100 
-            for d in group_data['activity_level']
-        ]
-        
-        fig.add_trace(
+        # Add trend line of total (light, moderate and intense) activity
+        traces.append(
             go.Scatter(
                 x=group_data['time'],
-                y=active_pct,
+                y=to_float32(activity_pct[in_group, -1]),
                 name=f"{group} Activity Trend",
                 line=dict(color='rgba(0,0,0,0.3)', width=1.5),  # Lighter black line
                 showlegend=False
-            ),
-            row=i, col=1
+            )
         )
+        rows.extend([i] * (len(ACTIVITY_LEVELS) + 1))
+    
+    return traces, rows
+
+def create_activity_distribution_plot(patterns_df):
+    """Create activity level distribution plot by team in 15-min intervals"""
+    pr_groups = ['DALMUIR', 'KILMALID', 'KB3']
+    
+    # Create subplots - one row per group
+    fig = make_subplots(
+        rows=3, cols=1,
+        subplot_titles=[f"{group} Activity Distribution" for group in pr_groups],
+        shared_xaxes=True,
+        vertical_spacing=0.08
+    )
+    
+    traces, rows = _activity_distribution_traces(patterns_df)
+    fig.add_traces(traces, rows=rows, cols=1)
     
     fig.update_layout(
         height=900,
@@ -230,28 +270,28 @@ def create_activity_distribution_plot(patterns_df):
     
     return fig
 
+def _participant_count_traces(patterns_df):
+    """Dotted secondary-axis participant count trace of each group"""
+    # Count participants based on sum of activity levels, for every slot at once
+    participant_counts = (_activity_count_array(patterns_df).sum(axis=1) > 0).astype(np.int8)
+    
+    group_rows = patterns_df.groupby('standardized_group', sort=False, observed=True).indices
+    return [
+        go.Scatter(
+            x=patterns_df['time'].iloc[rows],
+            y=participant_counts[rows],
+            name=f"{group} - Participants",
+            yaxis='y2',
+            line=dict(dash='dot'),
+            showlegend=True
+        )
+        for group, rows in group_rows.items()
+    ]
+
 def add_participant_count_overlay(fig, patterns_df):
     """Add participant count overlay to existing visualization"""
     # Add secondary y-axis showing participant count
-    for group in patterns_df['standardized_group'].unique():
-        group_data = patterns_df[patterns_df['standardized_group'] == group]
-        
-        # Count participants based on sum of activity levels
-        participant_counts = group_data.apply(
-            lambda x: sum(x['activity_level'].values()) > 0,  # Changed this line
-            axis=1
-        ).astype(int)
-        
-        fig.add_trace(
-            go.Scatter(
-                x=group_data['time'],
-                y=participant_counts,
-                name=f"{group} - Participants",
-                yaxis='y2',
-                line=dict(dash='dot'),
-                showlegend=True
-            )
-        )
+    fig.add_traces(_participant_count_traces(patterns_df))
     
     fig.update_layout(
         yaxis2=dict(
@@ -266,17 +306,27 @@ def add_participant_count_overlay(fig, patterns_df):
 
 def create_participation_heatmap(df):
     """Create heatmap showing number of participants over time"""
-    # Resample data to 15-min intervals and count unique participants
-    participation_df = df.groupby(
-        ['standardized_group', pd.Grouper(key='local_time', freq='15min')] 
-    )['user_id'].nunique().reset_index()
+    # Bucket readings into 15-min intervals by integer division of their epoch nanoseconds
+    # (UTC offsets are whole hours, so these are the same intervals as flooring local time)
+    interval_ns = 15 * 60 * 1_000_000_000
+    local_time = df['local_time']
+    interval = pd.Series(
+        local_time.to_numpy(dtype='datetime64[ns]').view('i8') // interval_ns,
+        index=df.index,
+        name='local_time'
+    )
+    
+    # Count unique participants per group and interval, one column per interval
+    participation = df.groupby(
+        ['standardized_group', interval],
+        observed=True
+    )['user_id'].nunique().unstack()
+    participation.columns = pd.to_datetime(
+        participation.columns * interval_ns, utc=True
+    ).tz_convert(local_time.dt.tz).rename('local_time')
     
     fig = px.imshow(
-        participation_df.pivot(
-            index='standardized_group',
-            columns='local_time',
-            values='user_id'
-        ),
+        participation,
         title="Participant Coverage Over Time",
         labels={'color': 'Number of Participants'},
         aspect='auto'
@@ -284,65 +334,75 @@ def create_participation_heatmap(df):
     
     return fig
 
-def create_temporal_pattern_analysis(df):
-    """Analyze and visualize patterns over weeks/months"""
-    # Create weekly averages
-    weekly_stats = df.groupby(
-        ['standardized_group', pd.Grouper(key='local_time', freq='W')]
+def weekly_group_stats(df):
+    """Weekly stress, heart rate and participant aggregates per group"""
+    return df.groupby(
+        ['standardized_group', pd.Grouper(key='local_time', freq='W')],
+        observed=True
     ).agg({
         'stress_score': ['mean', 'std'],
         'user_id': 'nunique',
         'heart_rate': 'mean'
     }).reset_index()
-    
-    # Create visualization with multiple subplots
-    fig = make_subplots(
-        rows=3, cols=1,
-        subplot_titles=(
-            "Weekly Average Stress Score",
-            "Weekly Average Heart Rate",
-            "Number of Active Participants"
-        )
-    )
-    
-    for group in weekly_stats['standardized_group'].unique():
-        group_data = weekly_stats[weekly_stats['standardized_group'] == group]
+
+def _temporal_pattern_traces(weekly_stats):
+    """Weekly stress, heart rate and participation traces of each group, with their subplot rows"""
+    traces = []
+    for group, group_data in weekly_stats.groupby('standardized_group', sort=False, observed=True):
         
         # Stress score trend
-        fig.add_trace(
+        traces.append(
             go.Scatter(
                 x=group_data['local_time'],
-                y=group_data[('stress_score', 'mean')],
+                y=to_float32(group_data[('stress_score', 'mean')]),
                 name=f"{group} - Stress",
                 error_y=dict(
                     type='data',
-                    array=group_data[('stress_score', 'std')],
+                    array=to_float32(group_data[('stress_score', 'std')]),
                     visible=True
                 )
-            ),
-            row=1, col=1
+            )
         )
         
         # Heart rate trend
-        fig.add_trace(
+        traces.append(
             go.Scatter(
                 x=group_data['local_time'],
-                y=group_data[('heart_rate', 'mean')],
+                y=to_float32(group_data[('heart_rate', 'mean')]),
                 name=f"{group} - HR"
-            ),
-            row=2, col=1
+            )
         )
         
         # Participation trend
-        fig.add_trace(
+        traces.append(
             go.Scatter(
                 x=group_data['local_time'],
                 y=group_data[('user_id', 'nunique')],
                 name=f"{group} - Participants"
-            ),
-            row=3, col=1
+            )
         )
     
+    return traces, [1, 2, 3] * (len(traces) // 3)
+
+def create_temporal_pattern_analysis(df, weekly_stats=None):
+    """Analyze and visualize patterns over weeks/months"""
+    # Create weekly averages, unless the caller already has them
+    if weekly_stats is None:
+        weekly_stats = weekly_group_stats(df)
+    
+    # Create visualization with multiple subplots
+    fig = make_subplots(
+        rows=3, cols=1,
+        subplot_titles=(
+            "Weekly Average Stress Score",
+            "Weekly Average Heart Rate",
+            "Number of Active Participants"
+        )
+    )
+    
+    traces, rows = _temporal_pattern_traces(weekly_stats)
+    fig.add_traces(traces, rows=rows, cols=1)
+    
     fig.update_layout(
         height=900,
         showlegend=True,
@@ -351,18 +411,15 @@ def create_temporal_pattern_analysis(df):
     
     return fig
 
-def create_monthly_comparison(df):
-    """Compare patterns between months"""
-    # Create working copy
-    df = df.copy()
-    
-    # Add month and year columns
-    df['month'] = df['local_time'].dt.month
-    df['year'] = df['local_time'].dt.year
+def monthly_time_patterns(df):
+    """Stress and participant aggregates per group, month and time of day"""
+    # Create working copy (month and year come from the cleaned data)
+    df = df.copy(deep=False)
     df['hour_minute'] = df['local_time'].dt.strftime('%H:%M')
     
     monthly_patterns = df.groupby(
-        ['standardized_group', 'year', 'month', 'hour_minute']
+        ['standardized_group', 'year', 'month', 'hour_minute'],
+        observed=True
     ).agg({
         'stress_score': ['mean', 'std'],
         'user_id': 'nunique'
@@ -374,6 +431,14 @@ def create_monthly_comparison(df):
         for col in monthly_patterns.columns
     ]
     
+    return monthly_patterns
+
+def create_monthly_comparison(df, monthly_patterns=None):
+    """Compare patterns between months"""
+    # Aggregate by month and time of day, unless the caller already has
+    if monthly_patterns is None:
+        monthly_patterns = monthly_time_patterns(df)
+    
     fig = px.scatter(
         monthly_patterns,
         x='hour_minute',
@@ -382,6 +447,7 @@ def create_monthly_comparison(df):
         facet_row='month',
         error_y='stress_score_std',
         size='user_id_nunique',
+        render_mode='webgl',  # One marker per group/month/minute; too many for SVG
         title="Monthly Stress Patterns Comparison",
         labels={
             'hour_minute': 'Time of Day',
@@ -420,79 +486,91 @@ def create_productivity_metrics_plot(cask_df):
         "Volume Consistency - Site Stability Analysis": "<br>Spread of month-over-month changes"
     }
     
-    for site in cask_df['site'].unique():
-        site_data = cask_df[cask_df['site'] == site].copy()
+    # Collect every site's traces and their subplot cells, then add them in one call
+    traces, rows, cols = [], [], []
+    for site, site_data in cask_df.groupby('site', sort=False):
+        # Month-over-month changes as arrays, shared by the change bars and the volatility boxes
+        receipts_mom = to_float32(site_data['receipts_mom_var'])
+        dispatches_mom = to_float32(site_data['dispatches_mom_var'])
         
         # Monthly Volume
-        fig.add_trace(
+        traces.append(
             go.Scatter(
                 x=site_data['date'],
-                y=site_data['receipts'],
+                y=to_float32(site_data['receipts']),
                 name=f"{site} - Receipts",
                 line=dict(color=colors[site], dash='solid'),
                 mode='lines+markers',
                 showlegend=True
-            ),
-            row=1, col=1
+            )
         )
-        fig.add_trace(
+        rows.append(1)
+        cols.append(1)
+        traces.append(
             go.Scatter(
                 x=site_data['date'],
-                y=site_data['dispatches'],
+                y=to_float32(site_data['dispatches']),
                 name=f"{site} - Dispatches",
                 line=dict(color=colors[site], dash='dot'),
                 mode='lines+markers',
                 showlegend=True
-            ),
-            row=1, col=1
+            )
         )
+        rows.append(1)
+        cols.append(1)
         
         # Month-over-Month Changes
-        fig.add_trace(
+        traces.append(
             go.Bar(
                 x=site_data['date'],
-                y=site_data['receipts_mom_var'],
+                y=receipts_mom,
                 name=f"{site} - Receipts MoM",
                 marker_color=colors[site],
                 opacity=0.7,
                 showlegend=False
-            ),
-            row=1, col=2
+            )
         )
-        fig.add_trace(
+        rows.append(1)
+        cols.append(2)
+        traces.append(
             go.Bar(
                 x=site_data['date'],
-                y=site_data['dispatches_mom_var'],
+                y=dispatches_mom,
                 name=f"{site} - Dispatches MoM",
                 marker_color=colors[site],
                 opacity=0.3,
                 showlegend=False
-            ),
-            row=1, col=2
+            )
         )
+        rows.append(1)
+        cols.append(2)
         
         # Volatility Analysis
-        fig.add_trace(
+        traces.append(
             go.Box(
-                y=abs(site_data['receipts_mom_var']),
+                y=np.abs(receipts_mom),
                 name=f"{site} - Receipts",
                 marker_color=colors[site],
                 boxpoints='all',
                 showlegend=False
-            ),
-            row=2, col=1
+            )
         )
-        fig.add_trace(
+        rows.append(2)
+        cols.append(1)
+        traces.append(
             go.Box(
-                y=abs(site_data['dispatches_mom_var']),
+                y=np.abs(dispatches_mom),
                 name=f"{site} - Dispatches",
                 marker_color=colors[site],
                 opacity=0.6,
                 boxpoints='all',
                 showlegend=False
-            ),
-            row=2, col=1
+            )
         )
+        rows.append(2)
+        cols.append(1)
+    
+    fig.add_traces(traces, rows=rows, cols=cols)
 
     # Update subplot titles with explanations
     for i, title in enumerate(fig.layout.annotations[:3]):  # Changed from 6 to 3
@@ -527,7 +605,8 @@ def create_productivity_metrics_plot(cask_df):
     return fig
 
 
-def create_comprehensive_dashboard(cleaned_df, pattern_results, correlation_results):
+def create_comprehensive_dashboard(cleaned_df, pattern_results, correlation_results,
+                                   weekly_stats=None, monthly_patterns=None):
     """Create comprehensive dashboard with all analyses"""
     
     # Create subplot grid
@@ -549,38 +628,45 @@ def create_comprehensive_dashboard(cleaned_df, pattern_results, correlation_resu
         ]
     )
     
-    # Add daily patterns
-    stress_plot = create_stress_patterns_plot(pattern_results['hourly_patterns'])
-    add_participant_count_overlay(stress_plot, pattern_results['hourly_patterns'])
-    for trace in stress_plot.data:
-        fig.add_trace(trace, row=1, col=1)
+    # Collect every panel's traces and their subplot cells, then add them in one call
+    traces, rows, cols = [], [], []
+    
+    def add_panel(panel_traces, row, col):
+        traces.extend(panel_traces)
+        rows.extend([row] * len(panel_traces))
+        cols.extend([col] * len(panel_traces))
+    
+    # Add daily patterns, building each panel's traces directly rather than whole figures
+    hourly_patterns = pattern_results['hourly_patterns']
+    add_panel(
+        _stress_patterns_traces(hourly_patterns) + _participant_count_traces(hourly_patterns),
+        1, 1
+    )
     
     # Add activity distribution
-    activity_plot = create_activity_distribution_plot(pattern_results['hourly_patterns'])
-    for trace in activity_plot.data:
-        fig.add_trace(trace, row=1, col=2)
+    add_panel(_activity_distribution_traces(hourly_patterns)[0], 1, 2)
     
     # Add participation heatmap
     participation_map = create_participation_heatmap(cleaned_df)
-    fig.add_trace(participation_map.data[0], row=2, col=1)
+    add_panel(participation_map.data[:1], 2, 1)
     
     # Add temporal patterns
-    temporal_patterns = create_temporal_pattern_analysis(cleaned_df)
-    for trace in temporal_patterns.data:
-        fig.add_trace(trace, row=2, col=2)
+    if weekly_stats is None:
+        weekly_stats = weekly_group_stats(cleaned_df)
+    add_panel(_temporal_pattern_traces(weekly_stats)[0], 2, 2)
     
     # Add monthly comparison
-    monthly_comparison = create_monthly_comparison(cleaned_df)
-    for trace in monthly_comparison.data:
-        fig.add_trace(trace, row=3, col=1)
+    monthly_comparison = create_monthly_comparison(cleaned_df, monthly_patterns)
+    add_panel(monthly_comparison.data, 3, 1)
     
-    # Add correlation heatmap
-    correlation_plot = create_correlation_plots(correlation_results)
-    fig.add_trace(correlation_plot.data[0], row=3, col=2)
+    # Add correlation heatmap of the first group
+    groups = list(correlation_results['correlations'].keys())
+    add_panel([_correlation_heatmap_trace(correlation_results, groups[0], True)], 3, 2)
     
     # Add stress heatmap at bottom
-    stress_heatmap = create_stress_patterns_heatmap(pattern_results['hourly_patterns'])
-    fig.add_trace(stress_heatmap.data[0], row=4, col=1)
+    add_panel([_stress_heatmap_trace(_stress_heatmap_pivot(hourly_patterns))], 4, 1)
+    
+    fig.add_traces(traces, rows=rows, cols=cols)
     
     # Update layout
     fig.update_layout(
@@ -603,7 +689,8 @@ def create_productivity_correlation_plot(df, cask_df):
     
     # Aggregate stress scores to monthly level
     monthly_stress = df[df['is_working_hours']].groupby(
-        ['standardized_group', pd.Grouper(freq='ME')]
+        ['standardized_group', pd.Grouper(freq='ME')],
+        observed=True
     )['stress_score'].mean().reset_index()
     
     # Convert end-of-month dates to start-of-month dates to match cask data
@@ -631,13 +718,12 @@ def create_productivity_correlation_plot(df, cask_df):
     fig = go.Figure()
     
     # Add one trace per group showing only receipts
-    for group in merged_data['standardized_group'].unique():
-        group_data = merged_data[merged_data['standardized_group'] == group]
+    for group, group_data in merged_data.groupby('standardized_group', sort=False, observed=True):
         
         fig.add_trace(
-            go.Scatter(
-                x=group_data['stress_score'],
-                y=group_data['receipts'],
+            go.Scattergl(
+                x=to_float32(group_data['stress_score']),
+                y=to_float32(group_data['receipts']),
                 mode='markers',
                 name=group,
                 marker=dict(
@@ -681,6 +767,36 @@ def create_productivity_correlation_plot(df, cask_df):
     
     return fig
 
+def _correlation_heatmap_trace(correlation_results, group, showscale):
+    """Annotated correlation heatmap trace of one group"""
+    correlations = correlation_results['correlations'][group]
+    p_values = correlation_results['statistics'][group]
+    
+    # Create annotation text showing correlation and p-value, formatting only the defined cells
+    corr_values = correlations.to_numpy()
+    p_array = p_values.to_numpy()
+    defined = ~pd.isna(corr_values)
+    annotations = np.full(corr_values.shape, "", dtype=object)
+    annotations[defined] = [
+        f"r={corr:.2f}<br>p={p_val:.3f}"
+        for corr, p_val in zip(corr_values[defined], p_array[defined])
+    ]
+    annotations = annotations.ravel().tolist()
+
+    return go.Heatmap(
+        z=np.ascontiguousarray(corr_values, dtype=np.float32),
+        x=correlations.columns.to_numpy(),
+        y=correlations.index.to_numpy(),
+        text=annotations,
+        texttemplate="%{text}",
+        textfont={"size": 10},
+        colorscale='RdBu',
+        zmid=0,
+        zmin=-1,
+        zmax=1,
+        showscale=showscale
+    )
+
 def create_correlation_plots(correlation_results):
     """Create correlation visualization between physical metrics and productivity"""
     
@@ -694,40 +810,12 @@ def create_correlation_plots(correlation_results):
     )
     
     # Add correlation heatmap for each group
-    for idx, group in enumerate(groups, 1):
-        correlations = correlation_results['correlations'][group]
-        p_values = correlation_results['statistics'][group]
-        
-        # Create annotation text showing correlation and p-value
-        annotations = []
-        for i in range(len(correlations.index)):
-            for j in range(len(correlations.columns)):
-                corr = correlations.iloc[i, j]
-                p_val = p_values.iloc[i, j]
-                if not pd.isna(corr):
-                    annotations.append(
-                        f"r={corr:.2f}<br>p={p_val:.3f}"
-                    )
-                else:
-                    annotations.append("")
-        
-        # Add heatmap trace
-        fig.add_trace(
-            go.Heatmap(
-                z=correlations.values,
-                x=correlations.columns,
-                y=correlations.index,
-                text=annotations,
-                texttemplate="%{text}",
-                textfont={"size": 10},
-                colorscale='RdBu',
-                zmid=0,
-                zmin=-1,
-                zmax=1,
-                showscale=True if idx == 1 else False
-            ),
-            row=idx, col=1
-        )
+    fig.add_traces(
+        [_correlation_heatmap_trace(correlation_results, group, idx == 1)
+         for idx, group in enumerate(groups, 1)],
+        rows=list(range(1, len(groups) + 1)),
+        cols=1
+    )
     
     # Update layout
     fig.update_layout(
@@ -751,14 +839,20 @@ def create_monthly_summary_plot(monthly_data):
         vertical_spacing=0.15
     )
 
+    # Build the first-of-month dates once for the trend and efficiency panels
+    monthly_data = monthly_data.copy(deep=False)
+    monthly_data['month_start'] = pd.to_datetime(monthly_data[['year', 'month']].assign(day=1))
+
+    # Split by group once; all four panels reuse the same partition
+    groups = dict(list(monthly_data.groupby('standardized_group', sort=False, observed=True)))
+
     # Productivity trends
-    for group in monthly_data['standardized_group'].unique():
-        group_data = monthly_data[monthly_data['standardized_group'] == group]
+    for group, group_data in groups.items():
         
         fig.add_trace(
             go.Scatter(
-                x=pd.to_datetime(group_data[['year', 'month']].assign(day=1)),
-                y=group_data['receipts'],
+                x=group_data['month_start'],
+                y=to_float32(group_data['receipts']),
                 name=f"{group} - Receipts",
                 mode='lines+markers'
             ),
@@ -766,13 +860,12 @@ def create_monthly_summary_plot(monthly_data):
         )
 
     # Stress vs Productivity scatter
-    for group in monthly_data['standardized_group'].unique():
-        group_data = monthly_data[monthly_data['standardized_group'] == group]
+    for group, group_data in groups.items():
         
         fig.add_trace(
-            go.Scatter(
-                x=group_data['stress_score_mean'],
-                y=group_data['receipts'],
+            go.Scattergl(
+                x=to_float32(group_data['stress_score_mean']),
+                y=to_float32(group_data['receipts']),
                 mode='markers',
                 name=group,
                 text=[f"{y}-{m}" for y, m in zip(group_data['year'], group_data['month'])],
@@ -782,12 +875,11 @@ def create_monthly_summary_plot(monthly_data):
         )
 
     # Monthly stress distributions
-    for group in monthly_data['standardized_group'].unique():
-        group_data = monthly_data[monthly_data['standardized_group'] == group]
+    for group, group_data in groups.items():
         
         fig.add_trace(
             go.Box(
-                y=group_data['stress_score_mean'],
+                y=to_float32(group_data['stress_score_mean']),
                 name=group,
                 boxpoints='all'
             ),
@@ -795,13 +887,12 @@ def create_monthly_summary_plot(monthly_data):
         )
 
     # Productivity per stress unit
-    for group in monthly_data['standardized_group'].unique():
-        group_data = monthly_data[monthly_data['standardized_group'] == group]
+    for group, group_data in groups.items():
         
         fig.add_trace(
             go.Bar(
-                x=pd.to_datetime(group_data[['year', 'month']].assign(day=1)),
-                y=group_data['productivity_stress_ratio'],
+                x=group_data['month_start'],
+                y=to_float32(group_data['productivity_stress_ratio']),
                 name=f"{group} - Efficiency"
             ),
             row=2, col=2
@@ -835,18 +926,18 @@ def create_time_patterns_plot(time_patterns):
         vertical_spacing=0.15
     )
 
-    # Separate high and normal productivity periods
-    high_prod = time_patterns[time_patterns['is_high_prod']]
-    normal_prod = time_patterns[~time_patterns['is_high_prod']]
+    # Separate high and normal productivity periods by group, in a single groupby
+    splits = dict(list(time_patterns.groupby(['is_high_prod', 'standardized_group'], observed=True)))
+    high_prod = {group: group_data for (is_high_prod, group), group_data in splits.items() if is_high_prod}
+    normal_prod = {group: group_data for (is_high_prod, group), group_data in splits.items() if not is_high_prod}
 
     # High productivity patterns
-    for group in sorted(high_prod['standardized_group'].unique()):
-        group_data = high_prod[high_prod['standardized_group'] == group]
+    for group, group_data in high_prod.items():
         
         fig.add_trace(
             go.Scatter(
                 x=group_data['time_of_day'],
-                y=group_data['stress_score_mean'],
+                y=to_float32(group_data['stress_score_mean']),
                 name=group,
                 mode='lines+markers',
                 line=dict(color=colors[group], width=2),
@@ -857,13 +948,12 @@ def create_time_patterns_plot(time_patterns):
         )
 
     # Normal productivity patterns
-    for group in sorted(normal_prod['standardized_group'].unique()):
-        group_data = normal_prod[normal_prod['standardized_group'] == group]
+    for group, group_data in normal_prod.items():
         
         fig.add_trace(
             go.Scatter(
                 x=group_data['time_of_day'],
-                y=group_data['stress_score_mean'],
+                y=to_float32(group_data['stress_score_mean']),
                 name=group,
                 mode='lines+markers',
                 line=dict(color=colors[group], width=2),
@@ -874,22 +964,21 @@ def create_time_patterns_plot(time_patterns):
         )
 
     # Pattern comparison (difference)
+    # Pivot high/normal means side by side once instead of merging per group
+    wide = time_patterns.pivot(
+        index=['standardized_group', 'time_of_day'],
+        columns='is_high_prod',
+        values='stress_score_mean'
+    ).reindex(columns=[True, False])
+    difference = (wide[True] - wide[False]).dropna()
+    group_differences = dict(list(difference.groupby(level='standardized_group', sort=False, observed=True)))
     for group in time_patterns['standardized_group'].unique():
-        group_high = high_prod[high_prod['standardized_group'] == group]
-        group_normal = normal_prod[normal_prod['standardized_group'] == group]
-        
-        # Merge on time_of_day to calculate difference
-        comparison = pd.merge(
-            group_high, 
-            group_normal, 
-            on='time_of_day',
-            suffixes=('_high', '_normal')
-        )
+        comparison = group_differences.get(group, difference.iloc[:0])
         
         fig.add_trace(
             go.Scatter(
-                x=comparison['time_of_day'],
-                y=comparison['stress_score_mean_high'] - comparison['stress_score_mean_normal'],
+                x=comparison.index.get_level_values('time_of_day'),
+                y=to_float32(comparison.values),
                 name=group,
                 mode='lines+markers',
                 line=dict(color=colors[group], width=2),
@@ -924,16 +1013,46 @@ def create_time_patterns_plot(time_patterns):
 
     return fig
 
-def create_daily_patterns_plot(daily_patterns):
-    """Create visualization of daily patterns in high vs normal productivity periods."""
-    
-    # Define consistent colors for groups
-    colors = {
-        'DALMUIR': '#1f77b4',    # blue
-        'KB3': '#2ca02c',        # green
-        'KILMALID': '#ff7f0e'    # orange
-    }
-    
+def _split_means(codes, is_high, values, n_groups):
+    """Mean of values per (is_high, group code) cell, skipping NaNs and unknown groups"""
+    valid = (codes >= 0) & ~np.isnan(values)
+    cells = is_high[valid].astype(np.intp) * n_groups + codes[valid]
+    sums = np.bincount(cells, weights=values[valid], minlength=2 * n_groups)
+    counts = np.bincount(cells, minlength=2 * n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (sums / counts).reshape(2, n_groups)
+
+# Hover text of the daily pattern boxes and difference bars
+_BOX_HOVER = "Group: %{fullData.name}<br>Biometric Productivity: %{y:.1f}<br><extra></extra>"
+_BAR_HOVER = "Group: %{x}<br>Difference: %{y:.1f}<br><extra></extra>"
+
+def _box(y, name, show):
+    """Daily productivity box trace as a plain dict, skipping graph object validation"""
+    return dict(
+        type='box',
+        y=to_float32(y),
+        name=name,
+        legendgroup=name,
+        boxpoints='all',
+        showlegend=show,
+        hovertemplate=_BOX_HOVER
+    )
+
+def _bar(groups, differences, colors):
+    """High vs normal difference bars of every group, one trace as a plain dict"""
+    return dict(
+        type='bar',
+        x=list(groups),
+        y=differences,
+        name="Difference",
+        marker_color=[colors[group] for group in groups],
+        showlegend=False,  # Don't repeat in legend
+        hovertemplate=_BAR_HOVER
+    )
+
+@lru_cache(maxsize=1)
+def _daily_patterns_template():
+    """Empty daily patterns subplot grid with its titles, layout and axis labels"""
     fig = make_subplots(
         rows=2, cols=2,
         subplot_titles=(
@@ -943,72 +1062,7 @@ def create_daily_patterns_plot(daily_patterns):
         ),
         vertical_spacing=0.15
     )
-
-    # Separate high and normal productivity days
-    high_prod = daily_patterns[daily_patterns['is_high_prod']]
-    normal_prod = daily_patterns[~daily_patterns['is_high_prod']]
-
-    # High productivity days
-    for group in sorted(high_prod['standardized_group'].unique()):
-        group_data = high_prod[high_prod['standardized_group'] == group]
-        
-        fig.add_trace(
-            go.Box(
-                y=group_data['stress_score_mean'],
-                name=group,
-                marker_color=colors[group],
-                boxpoints='all',
-                showlegend=True,  # Only show legend for first subplot
-                hovertemplate=(
-                    "Group: %{fullData.name}<br>" +
-                    "Biometric Productivity: %{y:.1f}<br>" +
-                    "<extra></extra>"
-                )
-            ),
-            row=1, col=1
-        )
-
-    # Normal productivity days
-    for group in sorted(normal_prod['standardized_group'].unique()):
-        group_data = normal_prod[normal_prod['standardized_group'] == group]
-        
-        fig.add_trace(
-            go.Box(
-                y=group_data['stress_score_mean'],
-                name=group,
-                marker_color=colors[group],
-                boxpoints='all',
-                showlegend=False,  # Don't repeat in legend
-                hovertemplate=(
-                    "Group: %{fullData.name}<br>" +
-                    "Biometric Productivity: %{y:.1f}<br>" +
-                    "<extra></extra>"
-                )
-            ),
-            row=1, col=2
-        )
-
-    # Pattern comparison (High vs Normal Volume Difference)
-    for group in sorted(daily_patterns['standardized_group'].unique()):
-        high_mean = high_prod[high_prod['standardized_group'] == group]['stress_score_mean'].mean()
-        normal_mean = normal_prod[normal_prod['standardized_group'] == group]['stress_score_mean'].mean()
-        
-        fig.add_trace(
-            go.Bar(
-                x=[group],
-                y=[high_mean - normal_mean],
-                name=group,
-                marker_color=colors[group],
-                showlegend=False,  # Don't repeat in legend
-                hovertemplate=(
-                    "Group: %{x}<br>" +
-                    "Difference: %{y:.1f}<br>" +
-                    "<extra></extra>"
-                )
-            ),
-            row=2, col=1
-        )
-
+    
     # Update layout
     fig.update_layout(
         height=800,  # Reduced height since we removed one subplot
@@ -1030,3 +1084,66 @@ def create_daily_patterns_plot(daily_patterns):
     
     return fig
 
+def create_daily_patterns_plot(daily_patterns):
+    """Create visualization of daily patterns in high vs normal productivity periods."""
+    colors = _GROUP_COLORS
+    group_names = list(colors)
+    n_groups = len(group_names)
+    
+    # Group by category codes rather than strings (cheap when the column already has these categories)
+    group_codes = pd.Categorical(daily_patterns['standardized_group'], categories=group_names).codes
+    
+    # Separate high and normal productivity days with a mask over the plotted column only,
+    # instead of copying the whole frame for each half
+    is_high = daily_patterns['is_high_prod'].to_numpy(dtype=np.bool_)
+    stress = daily_patterns['stress_score_mean'].to_numpy(dtype=np.float64)
+    
+    # Groups present in the data, in (alphabetical) category order
+    present = np.flatnonzero(np.bincount(group_codes[group_codes >= 0], minlength=n_groups))
+    groups = tuple(group_names[code] for code in present)
+    
+    # Mean of each group's normal (row 0) and high (row 1) days, in a single pass
+    means = _split_means(group_codes, is_high, stress, n_groups)
+    
+    # Sort the rows once by (is_high_prod, group) cell, keeping row order within each cell,
+    # so every box's values are one contiguous run of the sorted stress array
+    known = group_codes >= 0
+    cells = is_high[known].astype(np.intp) * n_groups + group_codes[known]
+    order = np.argsort(cells, kind='stable')
+    sorted_stress = stress[known][order]
+    bounds = np.searchsorted(cells[order], np.arange(2 * n_groups + 1))
+    
+    # Start from a copy of the prepared empty grid rather than laying out the subplots again
+    fig = go.Figure(_daily_patterns_template())
+
+    box_traces_hi, box_traces_norm, bar_traces = [], [], []
+    for code, group in enumerate(colors):
+        high = sorted_stress[bounds[n_groups + code]:bounds[n_groups + code + 1]]
+        normal = sorted_stress[bounds[code]:bounds[code + 1]]
+        
+        # High productivity days
+        if len(high):
+            box_traces_hi.append(_box(high, group, True))  # Only show legend for first subplot
+        
+        # Normal productivity days
+        if len(normal):
+            box_traces_norm.append(_box(normal, group, False))  # Don't repeat in legend
+
+    # Pattern comparison (High vs Normal Volume Difference), as one float32 array over the groups
+    differences = to_float32(means[1, present] - means[0, present])
+    bar_traces.append(_bar(groups, differences, colors))
+
+    # Add every subplot's traces in one call
+    fig.add_traces(
+        box_traces_hi + box_traces_norm + bar_traces,
+        rows=[1] * len(box_traces_hi) + [1] * len(box_traces_norm) + [2] * len(bar_traces),
+        cols=[1] * len(box_traces_hi) + [2] * len(box_traces_norm) + [1] * len(bar_traces)
+    )
+
+    # The boxes take their group colours from the colorway, in trace order
+    fig.update_layout(
+        colorway=[colors[trace['name']] for trace in box_traces_hi + box_traces_norm]
+    )
+    
+    return fig
+
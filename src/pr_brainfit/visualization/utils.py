@@ -0,0 +1,7 @@
+# PR_brainfit_analysis/visualization/utils.py
+
+import numpy as np
+
+def to_float32(values):
+    """Numeric trace values as float32, which serializes to half the bytes of float64"""
+    return np.asarray(values, dtype=np.float32)